@@ -0,0 +1,17 @@
+import { PickType } from '@nestjs/mapped-types';
+import { IsOptional, IsInt, Min, Max } from 'class-validator';
+import { Type } from 'class-transformer';
+import { QuerySongDto } from './query-song.dto';
+
+export class QueryManifestDto extends PickType(QuerySongDto, [
+  'language',
+  'tags',
+  'songbook',
+] as const) {
+  @IsOptional()
+  @Type(() => Number)
+  @IsInt()
+  @Min(1)
+  @Max(4)
+  prefixLength?: number;
+}
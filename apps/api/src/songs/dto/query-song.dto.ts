@@ -6,7 +6,7 @@ import {
   IsArray,
   IsIn,
 } from 'class-validator';
-import { Type } from 'class-transformer';
+import { Type, Transform } from 'class-transformer';
 
 export class QuerySongDto {
   @IsOptional()
@@ -26,6 +26,8 @@ export class QuerySongDto {
   language?: string;
 
   @IsOptional()
+  // A single ?tags=x arrives as a string
+  @Transform(({ value }) => (typeof value === 'string' ? [value] : value))
   @IsArray()
   @IsString({ each: true })
   tags?: string[];
@@ -30,6 +30,7 @@ import { SongVersionService } from './song-version.service';
 import { CreateSongDto } from './dto/create-song.dto';
 import { UpdateSongDto } from './dto/update-song.dto';
 import { QuerySongDto } from './dto/query-song.dto';
+import { QueryManifestDto } from './dto/query-manifest.dto';
 import { CurrentUser } from '../auth/decorators/current-user.decorator';
 import { Public } from '../auth/decorators/public.decorator';
 import { EditPermissionGuard } from '../auth/guards/edit-permission.guard';
@@ -89,6 +90,24 @@ export class SongController {
     };
   }
 
+  @Get('manifest')
+  @Public() // Public: Used by OpenLP plugin to detect local/remote drift
+  getHashManifest(@Query() query: QueryManifestDto) {
+    return this.songService.getHashManifest(query);
+  }
+
+  @Get('manifest/:bucket')
+  @Public() // Public: Used by OpenLP plugin to refetch only drifted songs
+  getHashBucket(
+    @Param('bucket') bucket: string,
+    @Query() query: QueryManifestDto,
+  ) {
+    if (!/^[0-9a-f]{1,4}$/.test(bucket)) {
+      throw new BadRequestException(`Invalid bucket: ${bucket}`);
+    }
+    return this.songService.getHashBucket(bucket, query);
+  }
+
   @Get(':id')
   @Public() // Public: Anonymous users can view individual songs
   findOne(@Param('id') id: string) {
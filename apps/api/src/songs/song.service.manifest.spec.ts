@@ -0,0 +1,174 @@
+/**
+ * Tests for the song hash manifest used by the OpenLP plugin reconciliation.
+ * Expected digests are pinned - the same values are asserted in
+ * apps/openlp-plugin/tests/test_hash_manifest.py, so both sides hash alike.
+ */
+import { SongService } from './song.service';
+import {
+  songContentHash,
+  bucketKey,
+  bucketHash,
+  buildHashManifest,
+} from './utils/hash-manifest.util';
+
+const SONG_A = {
+  id: '507f1f77bcf86cd799439011',
+  title: 'Amazing Grace',
+  number: '123',
+  copyright: null,
+  ccliNumber: null,
+  verses: 'Verse 1\n\nVerse 2',
+};
+const SONG_B = {
+  id: '507f1f77bcf86cd799439012',
+  title: 'Zażółć gęślą jaźń',
+  number: null,
+  copyright: '(c) 2024',
+  ccliNumber: '999',
+  verses: 'Zwrotka',
+};
+const HASH_A = '322b64c14a1218db7c0b1d7904d0aecf8671d35b';
+const HASH_B = 'b858fd07a77c81766ca08badd3bc8fcc591e46d4';
+
+describe('hash-manifest.util', () => {
+  it('should hash the song fields stored by OpenLP', () => {
+    expect(songContentHash(SONG_A)).toBe(HASH_A);
+    expect(songContentHash(SONG_B)).toBe(HASH_B);
+  });
+
+  it('should treat missing and null fields the same', () => {
+    expect(
+      songContentHash({
+        id: SONG_A.id,
+        title: SONG_A.title,
+        number: SONG_A.number,
+        verses: SONG_A.verses,
+      }),
+    ).toBe(HASH_A);
+  });
+
+  it('should bucket by prefix of the hashed ID', () => {
+    expect(bucketKey(SONG_A.id)).toBe('96');
+    expect(bucketKey(SONG_B.id)).toBe('3f');
+    expect(bucketKey(SONG_A.id, 1)).toBe('9');
+  });
+
+  it('should hash buckets independently of entry order', () => {
+    expect(bucketHash({ [SONG_A.id]: HASH_A, [SONG_B.id]: HASH_B })).toBe(
+      '6e7dd17a7866e10b237a798462ff052cd2c51623',
+    );
+    expect(bucketHash({ [SONG_B.id]: HASH_B, [SONG_A.id]: HASH_A })).toBe(
+      '6e7dd17a7866e10b237a798462ff052cd2c51623',
+    );
+  });
+
+  it('should build manifest of bucket hashes', () => {
+    expect(
+      buildHashManifest({ [SONG_A.id]: HASH_A, [SONG_B.id]: HASH_B }),
+    ).toEqual({
+      '96': '8b5e0e8f20ad0a1c1717c6bdf1637a3be8cde3a1',
+      '3f': '4d9543ae7e375a1ed080cce9ed6f2613887a0e3a',
+    });
+  });
+});
+
+describe('SongService hash manifest', () => {
+  let service: SongService;
+
+  // Raw documents as returned by .lean() - verses stored as ordered array
+  const songDocs = [
+    {
+      _id: SONG_A.id,
+      title: SONG_A.title,
+      number: SONG_A.number,
+      verses: [
+        { order: 2, content: 'Verse 2' },
+        { order: 1, content: 'Verse 1' },
+      ],
+    },
+    {
+      _id: SONG_B.id,
+      title: SONG_B.title,
+      copyright: SONG_B.copyright,
+      ccliNumber: SONG_B.ccliNumber,
+      verses: 'Zwrotka',
+    },
+  ];
+
+  const query = {
+    select: jest.fn().mockReturnThis(),
+    lean: jest.fn().mockReturnThis(),
+    exec: jest.fn(),
+  };
+  const mockSongModel = {
+    find: jest.fn().mockReturnValue(query),
+  };
+  const mockTagModel = {
+    find: jest.fn(),
+  };
+  const mockSongsVersionService = {
+    getVersion: jest.fn(),
+  };
+
+  beforeEach(() => {
+    query.exec.mockResolvedValue(songDocs);
+    mockSongsVersionService.getVersion.mockResolvedValue(7);
+    service = new SongService(
+      mockSongModel as any,
+      mockTagModel as any,
+      {} as any,
+      mockSongsVersionService as any,
+      {} as any,
+    );
+  });
+
+  afterEach(() => {
+    jest.clearAllMocks();
+  });
+
+  it('should return manifest with pinned bucket hashes', async () => {
+    const manifest = await service.getHashManifest();
+
+    expect(manifest).toEqual({
+      version: 7,
+      prefixLength: 2,
+      total: 2,
+      buckets: {
+        '96': '8b5e0e8f20ad0a1c1717c6bdf1637a3be8cde3a1',
+        '3f': '4d9543ae7e375a1ed080cce9ed6f2613887a0e3a',
+      },
+    });
+    expect(mockSongModel.find).toHaveBeenCalledWith({ deletedAt: null });
+  });
+
+  it('should return entries of a single bucket', async () => {
+    await expect(service.getHashBucket('96')).resolves.toEqual({
+      bucket: '96',
+      entries: { [SONG_A.id]: HASH_A },
+    });
+    await expect(service.getHashBucket('00')).resolves.toEqual({
+      bucket: '00',
+      entries: {},
+    });
+  });
+
+  it('should reuse cached hashes while the songs version is unchanged', async () => {
+    await service.getHashManifest();
+    await service.getHashBucket('3f');
+    expect(mockSongModel.find).toHaveBeenCalledTimes(1);
+
+    mockSongsVersionService.getVersion.mockResolvedValue(8);
+    await service.getHashManifest();
+    expect(mockSongModel.find).toHaveBeenCalledTimes(2);
+  });
+
+  it('should filter manifest by sync scope', async () => {
+    await service.getHashManifest({ songbook: 'wedrowiec', language: 'pl' });
+
+    expect(mockSongModel.find).toHaveBeenCalledWith({
+      deletedAt: null,
+      songbook: 'wedrowiec',
+      language: 'pl',
+    });
+  });
+});
@@ -326,6 +326,23 @@ describe('SongService', () => {
       expect(typeof result.data[0].verses).toBe('string');
     });
 
+    it('should sort by _id after the requested field for stable pages', async () => {
+      const query = {
+        skip: jest.fn().mockReturnThis(),
+        limit: jest.fn().mockReturnThis(),
+        sort: jest.fn().mockReturnThis(),
+        populate: jest.fn().mockReturnThis(),
+        lean: jest.fn().mockReturnThis(),
+        exec: jest.fn().mockResolvedValue([]),
+      };
+      mockSongModel.find.mockReturnValue(query);
+      mockSongModel.countDocuments.mockResolvedValue(0);
+
+      await service.findAll({ page: 2, limit: 100 });
+
+      expect(query.sort).toHaveBeenCalledWith({ title: 1, _id: 1 });
+    });
+
     it('should search in verses string field', async () => {
       const query: any = { search: 'grace' };
       const mockSongs = [
@@ -6,6 +6,7 @@ import { Tag, TagDocument } from '../schemas/tag.schema';
 import { CreateSongDto } from './dto/create-song.dto';
 import { UpdateSongDto } from './dto/update-song.dto';
 import { QuerySongDto } from './dto/query-song.dto';
+import { QueryManifestDto } from './dto/query-manifest.dto';
 import { AuditLogService } from '../audit-log/audit-log.service';
 import { AuditLogAction } from '../schemas/audit-log.schema';
 import { SongsVersionService } from './songs-version.service';
@@ -13,6 +14,12 @@ import { SongVersionService } from './song-version.service';
 import * as archiver from 'archiver';
 import { generateSongXml, sanitizeFilename } from './utils/xml-export.util';
 import { createOpenLPSqliteDatabase } from './utils/sqlite-export.util';
+import {
+  DEFAULT_BUCKET_PREFIX_LENGTH,
+  bucketKey,
+  buildHashManifest,
+  songContentHash,
+} from './utils/hash-manifest.util';
 import * as fs from 'fs';
 
 interface SqliteCacheEntry {
@@ -20,11 +27,19 @@ interface SqliteCacheEntry {
   timestamp: number;
 }
 
+interface HashEntriesCacheEntry {
+  version: number;
+  scopeKey: string; // JSON of language/tags/songbook filters
+  entries: Record<string, string>; // songId -> content hash
+}
+
 @Injectable()
 export class SongService {
   // Cache for SQLite export (1 minutes TTL)
   private sqliteCache: SqliteCacheEntry | null = null;
   private readonly SQLITE_CACHE_TTL = 1 * 60 * 1000; // 2 minutes in milliseconds
+  // Cache for hash manifest (invalidated when songs collection version changes)
+  private hashEntriesCache: HashEntriesCacheEntry | null = null;
 
   constructor(
     @InjectModel(Song.name) private songModel: Model<SongDocument>,
@@ -98,30 +113,7 @@ export class SongService {
     } = query;
     const skip = (page - 1) * limit;
 
-    const filter: any = {
-      deletedAt: null,
-    };
-
-    if (language) {
-      filter.language = language;
-    }
-
-    // Filter by songbook (category)
-    if (songbook) {
-      if (songbook === 'zborowe') {
-        // "zborowe" means songs that are NOT in any songbook ('pielgrzym', 'zielony', or 'wedrowiec')
-        filter.songbook = { $nin: ['pielgrzym', 'zielony', 'wedrowiec'] };
-      } else {
-        filter.songbook = songbook;
-      }
-    }
-
-    if (tags && tags.length > 0) {
-      // Find tag IDs by names
-      const tagDocs = await this.tagModel.find({ name: { $in: tags } });
-      const tagIds = tagDocs.map((t) => t._id.toString());
-      filter.tags = { $in: tagIds };
-    }
+    const filter = await this.buildScopeFilter({ language, tags, songbook });
 
     if (search) {
       // Use indexed search fields (searchTitle, searchLyrics) for better performance
@@ -137,6 +129,8 @@ export class SongService {
 
     const sort: any = {};
     sort[sortBy] = sortOrder === 'asc' ? 1 : -1;
+    // Tie-breaker - songs with equal titles must not move between pages
+    sort._id = sort._id ?? 1;
 
     // Select only needed fields for better performance
     const selectFields =
@@ -524,6 +518,122 @@ export class SongService {
     return transformedSongs;
   }
 
+  /**
+   * Build MongoDB filter for non-deleted songs limited by language, tags and songbook
+   */
+  private async buildScopeFilter(
+    scope: Pick<QuerySongDto, 'language' | 'tags' | 'songbook'>,
+  ): Promise<any> {
+    const { language, tags, songbook } = scope;
+
+    const filter: any = {
+      deletedAt: null,
+    };
+
+    if (language) {
+      filter.language = language;
+    }
+
+    // Filter by songbook (category)
+    if (songbook) {
+      if (songbook === 'zborowe') {
+        // "zborowe" means songs that are NOT in any songbook ('pielgrzym', 'zielony', or 'wedrowiec')
+        filter.songbook = { $nin: ['pielgrzym', 'zielony', 'wedrowiec'] };
+      } else {
+        filter.songbook = songbook;
+      }
+    }
+
+    if (tags && tags.length > 0) {
+      // Find tag IDs by names
+      const tagDocs = await this.tagModel.find({ name: { $in: tags } });
+      const tagIds = tagDocs.map((t) => t._id.toString());
+      filter.tags = { $in: tagIds };
+    }
+
+    return filter;
+  }
+
+  /**
+   * Get content hashes of songs in scope (songId -> hash), cached per collection version
+   */
+  private async getHashEntries(
+    scope: QueryManifestDto = {},
+  ): Promise<Record<string, string>> {
+    const version = await this.getVersion();
+    const { language, tags, songbook } = scope;
+    const scopeKey = JSON.stringify({ language, tags, songbook });
+    if (
+      this.hashEntriesCache &&
+      this.hashEntriesCache.version === version &&
+      this.hashEntriesCache.scopeKey === scopeKey
+    ) {
+      return this.hashEntriesCache.entries;
+    }
+
+    const filter = await this.buildScopeFilter({ language, tags, songbook });
+    const songs = await this.songModel
+      .find(filter)
+      .select('title number copyright ccliNumber verses')
+      .lean()
+      .exec();
+
+    const entries: Record<string, string> = {};
+    for (const song of songs as any[]) {
+      // Same verses string as returned by findAll/findOne
+      let versesString = '';
+      if (Array.isArray(song.verses) && song.verses.length > 0) {
+        const sortedVerses = [...song.verses].sort(
+          (a: any, b: any) => a.order - b.order,
+        );
+        versesString = sortedVerses.map((v: any) => v.content).join('\n\n');
+      } else if (typeof song.verses === 'string') {
+        versesString = song.verses;
+      }
+
+      const id = song._id.toString();
+      entries[id] = songContentHash({
+        id,
+        title: song.title,
+        number: song.number,
+        copyright: song.copyright,
+        ccliNumber: song.ccliNumber,
+        verses: versesString,
+      });
+    }
+
+    this.hashEntriesCache = { version, scopeKey, entries };
+    return entries;
+  }
+
+  /**
+   * Get compact hash manifest (bucket key -> bucket hash) for drift detection
+   */
+  async getHashManifest(scope: QueryManifestDto = {}) {
+    const prefixLength = scope.prefixLength ?? DEFAULT_BUCKET_PREFIX_LENGTH;
+    const entries = await this.getHashEntries(scope);
+    return {
+      version: this.hashEntriesCache?.version ?? null,
+      prefixLength,
+      total: Object.keys(entries).length,
+      buckets: buildHashManifest(entries, prefixLength),
+    };
+  }
+
+  /**
+   * Get content hashes of songs in a single manifest bucket
+   */
+  async getHashBucket(bucket: string, scope: QueryManifestDto = {}) {
+    const entries = await this.getHashEntries(scope);
+    const bucketEntries: Record<string, string> = {};
+    for (const [id, hash] of Object.entries(entries)) {
+      if (bucketKey(id, bucket.length) === bucket) {
+        bucketEntries[id] = hash;
+      }
+    }
+    return { bucket, entries: bucketEntries };
+  }
+
   /**
    * Get current version of songs collection
    */
@@ -0,0 +1,90 @@
+/**
+ * Utility functions for building the song hash manifest used by clients
+ * (OpenLP plugin) to detect drift between their local database and the API.
+ *
+ * The hashing rules must stay in sync with openlp_sync_plugin/hash_manifest.py.
+ */
+import { createHash } from 'crypto';
+
+export const DEFAULT_BUCKET_PREFIX_LENGTH = 2;
+
+export interface HashableSong {
+  id: string;
+  title?: string | null;
+  number?: string | null;
+  copyright?: string | null;
+  ccliNumber?: string | null;
+  verses?: string | null;
+}
+
+function sha1(text: string): string {
+  return createHash('sha1').update(text, 'utf8').digest('hex');
+}
+
+/**
+ * Hash of the song fields that the OpenLP plugin stores locally
+ */
+export function songContentHash(song: HashableSong): string {
+  return sha1(
+    [song.title, song.number, song.copyright, song.ccliNumber, song.verses]
+      .map((value) => (value === null || value === undefined ? '' : value))
+      .join('\x1f'),
+  );
+}
+
+/**
+ * Bucket key of a song ID.
+ * Uses a prefix of the hashed ID - MongoDB ObjectIds start with a timestamp,
+ * so a raw prefix would put most of the catalog into a single bucket.
+ */
+export function bucketKey(
+  songId: string,
+  prefixLength: number = DEFAULT_BUCKET_PREFIX_LENGTH,
+): string {
+  return sha1(songId).substring(0, prefixLength);
+}
+
+/**
+ * Hash of a single bucket - order independent
+ */
+export function bucketHash(entries: Record<string, string>): string {
+  return sha1(
+    Object.keys(entries)
+      .sort()
+      .map((id) => `${id}:${entries[id]}\n`)
+      .join(''),
+  );
+}
+
+/**
+ * Group (songId -> contentHash) entries into buckets
+ */
+export function groupByBucket(
+  entries: Record<string, string>,
+  prefixLength: number = DEFAULT_BUCKET_PREFIX_LENGTH,
+): Record<string, Record<string, string>> {
+  const buckets: Record<string, Record<string, string>> = {};
+  for (const [id, hash] of Object.entries(entries)) {
+    const key = bucketKey(id, prefixLength);
+    if (!buckets[key]) {
+      buckets[key] = {};
+    }
+    buckets[key][id] = hash;
+  }
+  return buckets;
+}
+
+/**
+ * Build compact manifest: bucket key -> bucket hash
+ */
+export function buildHashManifest(
+  entries: Record<string, string>,
+  prefixLength: number = DEFAULT_BUCKET_PREFIX_LENGTH,
+): Record<string, string> {
+  const manifest: Record<string, string> = {};
+  const buckets = groupByBucket(entries, prefixLength);
+  for (const [key, bucketEntries] of Object.entries(buckets)) {
+    manifest[key] = bucketHash(bucketEntries);
+  }
+  return manifest;
+}
@@ -5,7 +5,9 @@ Uses the standard library (urllib) to avoid external dependencies.
 
 import json
 import logging
-from typing import List, Optional, Dict, Any
+import time
+from datetime import date, datetime
+from typing import List, Optional, Dict, Any, Tuple, Callable
 from urllib import request, parse, error
 
 log = logging.getLogger(__name__)
@@ -30,7 +32,8 @@ class ApiClient:
         Build a urllib request with optional query parameters and headers.
         """
         if params:
-            query = parse.urlencode(params)
+            # doseq: list values (e.g. tags) become repeated parameters
+            query = parse.urlencode(params, doseq=True)
             url = f"{url}?{query}"
 
         req = request.Request(url)
@@ -58,29 +61,64 @@ class ApiClient:
             log.error("Invalid JSON response: %s", json_error)
             raise Exception("Nieprawidłowa odpowiedź JSON z API")
 
-    def fetch_all_songs(self) -> List[Dict[str, Any]]:
+    def fetch_all_songs(
+        self,
+        scope: Optional[Dict[str, Any]] = None,
+        throttle: Optional[Callable[[float, int], None]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Fetch all songs from the API with pagination.
 
+        Args:
+            scope: Optional filters ('songbook', 'language', 'tags')
+            throttle: Optional callback called after each page with
+                (seconds spent fetching, number of songs), e.g. ResourceGovernor.throttle
+
         Returns:
             List of song dictionaries
         """
+        return self.fetch_song_catalog(scope, throttle)[0]
+
+    def fetch_song_catalog(
+        self,
+        scope: Optional[Dict[str, Any]] = None,
+        throttle: Optional[Callable[[float, int], None]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Fetch all songs from the API with pagination, with the total reported by the API.
+
+        Comparing the total with the number of unique songs received tells
+        whether the download is complete (no song skipped between pages).
+
+        Args:
+            scope: Optional filters ('songbook', 'language', 'tags')
+            throttle: Optional callback called after each page with
+                (seconds spent fetching, number of songs), e.g. ResourceGovernor.throttle
+
+        Returns:
+            Tuple (list of song dictionaries, meta.total of the last page or None)
+        """
         all_songs: List[Dict[str, Any]] = []
+        total = None
         page = 1
         limit = 100
 
         while True:
             url = f"{self.base_url}/songs"
-            params = {'page': page, 'limit': limit}
+            params = {'page': page, 'limit': limit, **(scope or {})}
             req = self._build_request(url, params=params)
 
             log.debug("Fetching songs page %s", page)
+            started = time.monotonic()
             data = self._execute(req)
 
             songs = data.get('data', [])
             all_songs.extend(songs)
+            if throttle:
+                throttle(time.monotonic() - started, len(songs))
 
             meta = data.get('meta', {})
+            total = meta.get('total')
             total_pages = meta.get('totalPages', page)
 
             if page >= total_pages or len(songs) < limit:
@@ -88,8 +126,8 @@ class ApiClient:
 
             page += 1
 
-        log.info("Fetched %s songs from API", len(all_songs))
-        return all_songs
+        log.info("Fetched %s of %s songs from API", len(all_songs), total)
+        return all_songs, total
 
     def get_song_by_id(self, song_id: str) -> Dict[str, Any]:
         """
@@ -105,3 +143,143 @@ class ApiClient:
         req = self._build_request(url)
         return self._execute(req)
 
+    def fetch_service_plans(self) -> List[Dict[str, Any]]:
+        """
+        Fetch all service plans (newest first)
+
+        Returns:
+            List of service plan dictionaries
+        """
+        url = f"{self.base_url}/service-plans"
+        req = self._build_request(url)
+        data = self._execute(req)
+        return data if isinstance(data, list) else []
+
+    def get_service_plan(self, plan_id: str) -> Dict[str, Any]:
+        """
+        Get a single service plan by ID
+
+        Args:
+            plan_id: Service plan ID
+
+        Returns:
+            Service plan dictionary
+        """
+        url = f"{self.base_url}/service-plans/{parse.quote(plan_id)}"
+        req = self._build_request(url)
+        return self._execute(req)
+
+    def fetch_upcoming_service_plan(self) -> Optional[Dict[str, Any]]:
+        """
+        Find the service plan that matters most right now.
+
+        The plan with the active (presented) item wins. Otherwise the earliest
+        plan dated today or later (in local time) is used, falling back to the
+        newest plan.
+
+        Returns:
+            Service plan dictionary or None if there are no plans
+        """
+        active = self._execute(self._build_request(f"{self.base_url}/service-plans/active"))
+        if active and active.get('servicePlan', {}).get('id'):
+            return self.get_service_plan(active['servicePlan']['id'])
+
+        plans = self.fetch_service_plans()
+        if not plans:
+            return None
+
+        today = date.today()
+        upcoming = [(plan_date, plan) for plan_date, plan in
+                    ((self._plan_local_date(plan.get('date')), plan) for plan in plans)
+                    if plan_date and plan_date >= today]
+        if upcoming:
+            return min(upcoming, key=lambda entry: entry[0])[1]
+
+        return plans[0]
+
+    @staticmethod
+    def _plan_local_date(value: Optional[str]) -> Optional[date]:
+        """
+        Parse a service plan date to a local calendar date
+
+        Plain dates ('2024-01-15') are taken as is, timestamps
+        ('2024-01-14T23:00:00.000Z') are converted to local time first.
+        """
+        if not value:
+            return None
+        try:
+            if len(value) <= 10:
+                return date.fromisoformat(value)
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            if parsed.tzinfo:
+                parsed = parsed.astimezone()
+            return parsed.date()
+        except ValueError:
+            log.warning("Invalid service plan date: %s", value)
+            return None
+
+    def fetch_songs_by_ids(
+        self,
+        song_ids: List[str],
+        throttle: Optional[Callable[[float, int], None]] = None
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Fetch specific songs one by one
+
+        Args:
+            song_ids: List of song IDs
+            throttle: Optional callback called after each song with
+                (seconds spent fetching, 1), e.g. ResourceGovernor.throttle
+
+        Returns:
+            Tuple (list of song dictionaries, list of IDs that could not be fetched)
+        """
+        songs: List[Dict[str, Any]] = []
+        failed_ids: List[str] = []
+        for song_id in song_ids:
+            started = time.monotonic()
+            try:
+                songs.append(self.get_song_by_id(song_id))
+            except Exception as e:
+                log.warning("Could not fetch song %s: %s", song_id, e)
+                failed_ids.append(song_id)
+            if throttle:
+                throttle(time.monotonic() - started, 1)
+        return songs, failed_ids
+
+    def fetch_hash_manifest(
+        self,
+        prefix_length: Optional[int] = None,
+        scope: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetch compact hash manifest used for drift detection
+
+        Args:
+            prefix_length: Optional bucket prefix length
+            scope: Optional filters ('songbook', 'language', 'tags')
+
+        Returns:
+            Dictionary with 'prefixLength', 'total' and 'buckets' (bucket key -> hash)
+        """
+        url = f"{self.base_url}/songs/manifest"
+        params = dict(scope or {})
+        if prefix_length:
+            params['prefixLength'] = prefix_length
+        req = self._build_request(url, params=params)
+        return self._execute(req)
+
+    def fetch_hash_bucket(self, bucket: str, scope: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """
+        Fetch content hashes of songs in a single manifest bucket
+
+        Args:
+            bucket: Bucket key from the manifest
+            scope: Optional filters ('songbook', 'language', 'tags')
+
+        Returns:
+            Dictionary mapping song ID -> content hash
+        """
+        url = f"{self.base_url}/songs/manifest/{parse.quote(bucket)}"
+        req = self._build_request(url, params=scope)
+        return self._execute(req).get('entries', {})
@@ -0,0 +1,92 @@
+"""
+Resource governor pacing background syncs so they don't compete with OpenLP's live output
+
+Both API downloads (per page or per song) and database write batches are
+reported to throttle(), so the budget covers the whole sync.
+"""
+
+import logging
+import time
+from typing import Callable, Dict, Any, Optional
+
+log = logging.getLogger(__name__)
+
+
+class ResourceGovernor:
+    """Paces sync downloads and batches to a CPU/I/O budget and pauses while OpenLP is presenting"""
+
+    def __init__(
+        self,
+        cpu_budget: float = 1.0,
+        io_budget: int = 0,
+        is_busy: Optional[Callable[[], bool]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        poll_interval: float = 0.5
+    ):
+        """
+        Initialize resource governor
+
+        Args:
+            cpu_budget: Fraction of wall time the sync may spend working (0-1]
+            io_budget: Maximum songs downloaded or written per second, 0 for no limit
+            is_busy: Callable returning True while the sync should pause (e.g. live slide shown)
+            should_stop: Callable returning True when the sync is cancelled
+            poll_interval: Seconds between is_busy checks while paused
+        """
+        self.cpu_budget = min(max(cpu_budget, 0.05), 1.0)
+        self.io_budget = max(io_budget, 0)
+        self.is_busy = is_busy or (lambda: False)
+        self.should_stop = should_stop or (lambda: False)
+        self.poll_interval = poll_interval
+
+        self.pause_count = 0
+        self.paused_seconds = 0.0
+        self.throttled_seconds = 0.0
+
+    def throttle(self, work_seconds: float, items: int):
+        """
+        Wait after a batch or download according to the budget, then while OpenLP is busy
+
+        Args:
+            work_seconds: Time spent processing the batch or downloading
+            items: Number of songs in the batch or download
+        """
+        delay = work_seconds * (1 / self.cpu_budget - 1)
+        if self.io_budget:
+            delay = max(delay, items / self.io_budget - work_seconds)
+        if delay > 0:
+            self.throttled_seconds += self._sleep(delay)
+
+        if self.is_busy() and not self.should_stop():
+            log.debug("OpenLP is presenting, pausing sync")
+            self.pause_count += 1
+            started = time.monotonic()
+            while self.is_busy() and not self.should_stop():
+                time.sleep(self.poll_interval)
+            self.paused_seconds += time.monotonic() - started
+
+    def _sleep(self, seconds: float) -> float:
+        """Sleep in short slices so cancellation is noticed; return time slept"""
+        started = time.monotonic()
+        deadline = started + seconds
+        while not self.should_stop():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, self.poll_interval))
+        return time.monotonic() - started
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get pause and budget statistics for the sync report
+
+        Returns:
+            Dictionary with budget settings and time spent throttled/paused
+        """
+        return {
+            'cpu_budget': self.cpu_budget,
+            'io_budget': self.io_budget,
+            'pause_count': self.pause_count,
+            'paused_seconds': round(self.paused_seconds, 1),
+            'throttled_seconds': round(self.throttled_seconds, 1)
+        }
@@ -0,0 +1,137 @@
+"""
+Hash manifest helpers for detecting drift between the local OpenLP database
+and the backend API.
+
+The hashing rules must stay in sync with apps/api/src/songs/utils/hash-manifest.util.ts.
+"""
+
+import hashlib
+from typing import Dict, Any, List, Iterable, Optional, Callable
+
+DEFAULT_BUCKET_PREFIX_LENGTH = 2
+
+
+def _sha1(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _verses_string(verses: Any) -> str:
+    """Normalize verses to the string form returned by the API"""
+    if isinstance(verses, list):
+        ordered = sorted(verses, key=lambda verse: verse.get('order', 0))
+        return '\n\n'.join(verse.get('content', '') for verse in ordered)
+    return verses or ''
+
+
+def song_content_hash(song: Dict[str, Any]) -> str:
+    """
+    Hash of the song fields that are stored in the OpenLP database
+
+    Args:
+        song: Song dictionary from API
+
+    Returns:
+        SHA-1 hex digest
+    """
+    values = [
+        song.get('title'),
+        song.get('number'),
+        song.get('copyright'),
+        song.get('ccliNumber'),
+        _verses_string(song.get('verses')),
+    ]
+    return _sha1('\x1f'.join('' if value is None else str(value) for value in values))
+
+
+def row_hash(values: Iterable[Optional[Any]]) -> str:
+    """Hash of raw column values of a local songs row"""
+    return _sha1('\x1f'.join('' if value is None else str(value) for value in values))
+
+
+def bucket_key(song_id: str, prefix_length: int = DEFAULT_BUCKET_PREFIX_LENGTH) -> str:
+    """
+    Bucket key of a song ID
+
+    Uses a prefix of the hashed ID - MongoDB ObjectIds start with a timestamp,
+    so a raw prefix would put most of the catalog into a single bucket.
+    """
+    return _sha1(song_id)[:prefix_length]
+
+
+def bucket_hash(entries: Dict[str, str]) -> str:
+    """Order independent hash of (backend_id -> content hash) entries"""
+    return _sha1(''.join(f"{song_id}:{entries[song_id]}\n" for song_id in sorted(entries)))
+
+
+def group_by_bucket(
+    entries: Dict[str, str],
+    prefix_length: int = DEFAULT_BUCKET_PREFIX_LENGTH
+) -> Dict[str, Dict[str, str]]:
+    """Group (backend_id -> content hash) entries into buckets"""
+    buckets: Dict[str, Dict[str, str]] = {}
+    for song_id, content_hash in entries.items():
+        buckets.setdefault(bucket_key(song_id, prefix_length), {})[song_id] = content_hash
+    return buckets
+
+
+def build_hash_manifest(
+    entries: Dict[str, str],
+    prefix_length: int = DEFAULT_BUCKET_PREFIX_LENGTH
+) -> Dict[str, str]:
+    """
+    Build compact manifest (bucket key -> bucket hash)
+
+    Also serves as a local stand-in for the API manifest, e.g.
+    build_hash_manifest({s['id']: song_content_hash(s) for s in songs}).
+    """
+    return {
+        key: bucket_hash(bucket_entries)
+        for key, bucket_entries in group_by_bucket(entries, prefix_length).items()
+    }
+
+
+def mismatched_buckets(local: Dict[str, str], remote: Dict[str, str]) -> List[str]:
+    """Bucket keys whose hashes differ or exist on only one side"""
+    return sorted(key for key in set(local) | set(remote) if local.get(key) != remote.get(key))
+
+
+def find_drift(
+    local_entries: Dict[str, str],
+    remote_manifest: Dict[str, str],
+    fetch_bucket: Callable[[str], Dict[str, str]],
+    prefix_length: int = DEFAULT_BUCKET_PREFIX_LENGTH,
+    out_of_scope: Iterable[str] = ()
+) -> Dict[str, List[str]]:
+    """
+    Find backend IDs that need to be refetched or deleted locally
+
+    Only buckets whose hashes differ are expanded with fetch_bucket
+    (API call, or a dictionary lookup as a local stand-in).
+
+    Args:
+        local_entries: Local backend_id -> content hash
+        remote_manifest: Remote bucket key -> bucket hash
+        fetch_bucket: Callable returning remote backend_id -> content hash for a bucket
+        prefix_length: Bucket prefix length used by the manifest
+        out_of_scope: Local backend IDs outside the sync scope according to
+            their stored metadata, left out of local_entries
+
+    Returns:
+        Dictionary with 'refetch' (missing locally or with a different hash)
+        and 'deleted' (present only locally, or out of scope) lists of backend IDs.
+        Out of scope songs the remote scope still lists (their stored metadata
+        is out of date) are only refetched.
+    """
+    local_buckets = group_by_bucket(local_entries, prefix_length)
+    local_manifest = {key: bucket_hash(entries) for key, entries in local_buckets.items()}
+
+    drift: Dict[str, List[str]] = {'refetch': [], 'deleted': []}
+    for key in mismatched_buckets(local_manifest, remote_manifest):
+        local = local_buckets.get(key, {})
+        # Bucket missing remotely - all of its songs are gone, nothing to fetch
+        remote = fetch_bucket(key) if key in remote_manifest else {}
+        drift['refetch'].extend(song_id for song_id, content_hash in sorted(remote.items())
+                                if local.get(song_id) != content_hash)
+        drift['deleted'].extend(sorted(set(local) - set(remote)))
+    drift['deleted'].extend(sorted(set(out_of_scope) - set(drift['refetch'])))
+    return drift
@@ -3,33 +3,161 @@ Main plugin class for OpenLP Sync Plugin
 """
 
 import logging
-from typing import Optional
+import time
+from typing import Optional, Dict, Any, Callable
 
 from openlp.core.common import Settings
 from openlp.core.common.registry import Registry
 from openlp.core.plugins import Plugin, StringContent
 from openlp.core.ui import MainWindow
-from PyQt5.QtCore import QObject, pyqtSignal, QThread
+from PyQt5.QtCore import QObject, pyqtSignal, QThread, QTimer
 from PyQt5.QtWidgets import QMessageBox, QPushButton, QDialog, QVBoxLayout, QLabel, QProgressBar
 
 from .api_client import ApiClient
 from .sync_service import SyncService
+from .hash_manifest import (
+    find_drift, build_hash_manifest, mismatched_buckets, DEFAULT_BUCKET_PREFIX_LENGTH
+)
+from .governor import ResourceGovernor
 from .settings_dialog import SettingsDialog
 
 log = logging.getLogger(__name__)
 
 
+def get_sync_scope() -> Dict[str, Any]:
+    """
+    Read the sync scope (songbook, language, tags) from plugin settings
+    
+    Returns:
+        API query filters, empty when the whole catalog is synced
+    """
+    settings = Settings()
+    scope: Dict[str, Any] = {}
+    
+    songbook = settings.value('openlp_sync_plugin/scope_songbook')
+    if songbook:
+        scope['songbook'] = songbook
+    
+    language = settings.value('openlp_sync_plugin/scope_language')
+    if language:
+        scope['language'] = language
+    
+    tags = settings.value('openlp_sync_plugin/scope_tags')
+    if tags:
+        scope['tags'] = [tag.strip() for tag in tags.split(',') if tag.strip()]
+    
+    return scope
+
+
+def get_governor_settings() -> Optional[Dict[str, Any]]:
+    """
+    Read resource governor settings
+    
+    Returns:
+        Dictionary with 'cpu_budget' (0-1) and 'io_budget' (songs/s), or None when disabled
+    """
+    settings = Settings()
+    if str(settings.value('openlp_sync_plugin/throttle')).lower() != 'true':
+        return None
+    return {
+        'cpu_budget': int(settings.value('openlp_sync_plugin/cpu_budget') or 50) / 100,
+        'io_budget': int(settings.value('openlp_sync_plugin/io_budget') or 0)
+    }
+
+
+def is_live_presenting() -> bool:
+    """
+    Check whether OpenLP's live controller is showing a slide
+    
+    Must run in the main (GUI) thread.
+    """
+    try:
+        live_controller = Registry().get('live_controller')
+        if not live_controller or not live_controller.service_item:
+            return False
+        # Blanked / theme / desktop screen - nothing is rendered on the projector
+        return live_controller.hide_mode() is None
+    except Exception:
+        log.exception("Error checking live controller state")
+        return False
+
+
+def refresh_openlp_songs(song_ids: list):
+    """
+    Reload changed songs in OpenLP's songs plugin without a restart
+    
+    Only songs already loaded in OpenLP's session are touched: they are
+    expired (reloaded lazily on next access) or, when deleted by the sync,
+    expunged. Songs not loaded yet are read fresh anyway.
+    
+    Must run in the main (GUI) thread.
+    
+    Args:
+        song_ids: OpenLP IDs of created/updated/deleted songs
+    """
+    if not song_ids:
+        return
+    
+    try:
+        media_item = Registry().get('songs')
+        if not media_item:
+            log.debug("Songs plugin not available, skipping refresh")
+            return
+        
+        from openlp.plugins.songs.lib.db import Song
+        
+        session = media_item.plugin.manager.session
+        changed = set(song_ids)
+        loaded = {obj.id: obj for obj in list(session.identity_map.values())
+                  if isinstance(obj, Song) and obj.id in changed}
+        
+        loaded_ids = list(loaded)
+        existing_ids = set()
+        for start in range(0, len(loaded_ids), 500):
+            batch = loaded_ids[start:start + 500]
+            existing_ids.update(row[0] for row in session.query(Song.id).filter(Song.id.in_(batch)))
+        
+        for song_id, song in loaded.items():
+            if song_id in existing_ids:
+                # Drop stale ORM state - the row was written outside OpenLP's session
+                session.expire(song)
+            else:
+                # Deleted by the sync
+                session.expunge(song)
+        
+        # Reload the Songs media manager list (new songs appear here)
+        Registry().execute('songs_load_list')
+    except Exception:
+        log.exception("Error refreshing OpenLP songs library")
+
+
 class SyncWorker(QThread):
     """Worker thread for sync operation"""
     
     progress = pyqtSignal(str)  # Progress message
+    priority_finished = pyqtSignal(int)  # Number of service plan songs synced
+    songs_changed = pyqtSignal(list)  # OpenLP IDs of created/updated songs
     finished = pyqtSignal(bool, str)  # success, message
     
-    def __init__(self, api_url: str, api_key: Optional[str], db_path: str):
+    # Reconciliation falls back to the paginated full download when drift is large
+    RECONCILE_MAX_BUCKET_RATIO = 0.5  # Share of mismatched buckets
+    RECONCILE_MAX_SONG_FETCHES = 100  # Songs fetched one by one
+    
+    def __init__(self, api_url: str, api_key: Optional[str], db_path: str, priority_sync: bool = False,
+                 reconcile: bool = False, full_refresh: bool = False, scope: Optional[Dict[str, Any]] = None,
+                 governor_settings: Optional[Dict[str, Any]] = None):
         super().__init__()
         self.api_url = api_url
         self.api_key = api_key
         self.db_path = db_path
+        self.priority_sync = priority_sync
+        self.reconcile = reconcile
+        self.full_refresh = full_refresh
+        self.scope = scope or {}
+        self.governor_settings = governor_settings
+        self.live_presenting = False  # Updated from the GUI thread
+        self.failed_ids = set()  # Backend IDs that could not be fetched
+        self.errors = 0  # Errors outside the main sync_songs/full_refresh call
         self.cancelled = False
     
     def run(self):
@@ -37,30 +165,189 @@ class SyncWorker(QThread):
         try:
             self.progress.emit("Łączenie z API...")
             api_client = ApiClient(self.api_url, self.api_key)
+            sync_service = SyncService(self.db_path)
+            
+            priority_ids = set()
+            if self.priority_sync:
+                priority_ids = self.sync_service_plan_songs(api_client, sync_service)
+                if self.cancelled:
+                    self.finished.emit(False, "Synchronizacja anulowana")
+                    return
+                # The rest of the catalog is not urgent - let OpenLP have the CPU
+                self.setPriority(QThread.LowPriority)
+            
+            governor = None
+            throttle = None
+            if self.governor_settings:
+                # Service plan songs above are urgent, the catalog is paced
+                self.setPriority(QThread.LowestPriority)
+                governor = ResourceGovernor(
+                    cpu_budget=self.governor_settings['cpu_budget'],
+                    io_budget=self.governor_settings['io_budget'],
+                    is_busy=lambda: self.live_presenting,
+                    should_stop=lambda: self.cancelled
+                )
+                sync_service = SyncService(self.db_path, governor=governor)
+                throttle = governor.throttle
             
-            self.progress.emit("Pobieranie pieśni z API...")
-            songs = api_client.fetch_all_songs()
+            songs = None
+            deleted_ids = set()
+            if self.reconcile and not self.full_refresh:
+                drifted = self.fetch_drifted_songs(api_client, sync_service, throttle)
+                if drifted is not None:
+                    songs, deleted_ids = drifted
+            keep_ids = None
+            if songs is None:
+                self.progress.emit("Pobieranie pieśni z API...")
+                songs, total = api_client.fetch_song_catalog(self.scope, throttle=throttle)
+                # Prune songs deleted remotely or out of scope only when nothing was skipped
+                if len({song.get('id') for song in songs}) == total:
+                    keep_ids = priority_ids | self.failed_ids
+                else:
+                    log.warning(f"Received {len(songs)} of {total} songs, not removing any synced songs")
             
             if self.cancelled:
                 self.finished.emit(False, "Synchronizacja anulowana")
                 return
             
+            songs = [song for song in songs if song.get('id') not in priority_ids]
             self.progress.emit(f"Znaleziono {len(songs)} pieśni. Aktualizowanie bazy danych...")
-            sync_service = SyncService(self.db_path)
             
-            result = sync_service.sync_songs(songs, progress_callback=self.progress.emit)
+            # Songs that failed to download must not be pruned as missing
+            if self.full_refresh:
+                result = sync_service.full_refresh(songs, progress_callback=self.progress.emit,
+                                                   keep_ids=keep_ids)
+            else:
+                result = sync_service.sync_songs(songs, progress_callback=self.progress.emit,
+                                                 keep_ids=keep_ids)
+            
+            # Songs just written are in scope, whatever their old metadata said
+            deleted_ids -= priority_ids | set(result['synced_ids'])
+            if deleted_ids:
+                self.progress.emit(f"Usuwanie {len(deleted_ids)} pieśni usuniętych z API lub spoza zakresu...")
+                removed = sync_service.delete_songs(deleted_ids)
+                result['deleted'] = len(removed)
+                result['changed_ids'].extend(removed)
+            self.songs_changed.emit(result['changed_ids'])
             
             if self.cancelled:
                 self.finished.emit(False, "Synchronizacja anulowana")
                 return
             
-            message = f"Synchronizacja zakończona!\n\nUtworzono: {result['created']}\nZaktualizowano: {result['updated']}\nBłędy: {result['errors']}"
+            result['errors'] += self.errors
+            message = f"Synchronizacja zakończona!\n\nUtworzono: {result['created']}\nZaktualizowano: {result['updated']}\nBez zmian: {result['unchanged']}\nBłędy: {result['errors']}"
+            if 'deleted' in result:
+                message += f"\nUsunięto: {result['deleted']}"
+            if governor:
+                stats = governor.stats()
+                message += (f"\n\nLimit CPU: {int(stats['cpu_budget'] * 100)}%"
+                            f", limit pobierania i zapisu: {stats['io_budget'] or 'brak'} pieśni/s"
+                            f"\nWstrzymania podczas prezentacji: {stats['pause_count']} ({stats['paused_seconds']} s)"
+                            f"\nSpowolnienie: {stats['throttled_seconds']} s")
+            if self.priority_sync:
+                message += f"\nPieśni z planu nabożeństwa: {len(priority_ids)}"
             self.finished.emit(True, message)
             
         except Exception as e:
             log.exception("Error during sync")
             self.finished.emit(False, f"Błąd podczas synchronizacji: {str(e)}")
     
+    def sync_service_plan_songs(self, api_client: ApiClient, sync_service: SyncService) -> set:
+        """
+        Sync songs from the active or upcoming service plan first
+        
+        Returns:
+            Set of backend IDs that were written to the database
+        """
+        self.progress.emit("Pobieranie planu nabożeństwa...")
+        try:
+            plan = api_client.fetch_upcoming_service_plan()
+        except Exception as e:
+            log.warning(f"Could not fetch service plan, skipping priority sync: {e}")
+            return set()
+        
+        if not plan:
+            return set()
+        
+        items = sorted(plan.get('items', []), key=lambda item: item.get('order', 0))
+        song_ids = list(dict.fromkeys(item['songId'] for item in items if item.get('songId')))
+        if not song_ids:
+            return set()
+        
+        self.progress.emit(f"Synchronizowanie pieśni z planu \"{plan.get('name', '')}\" ({len(song_ids)})...")
+        songs = self.fetch_songs_by_ids(api_client, song_ids)
+        result = sync_service.sync_songs(songs, progress_callback=self.progress.emit)
+        self.errors += result['errors']
+        self.songs_changed.emit(result['changed_ids'])
+        
+        # Songs that failed to be written are retried by the catalog pass
+        synced_ids = set(result['synced_ids'])
+        self.priority_finished.emit(len(synced_ids))
+        return synced_ids
+    
+    def fetch_drifted_songs(self, api_client: ApiClient, sync_service: SyncService,
+                            throttle: Optional[Callable[[float, int], None]] = None):
+        """
+        Fetch only songs from hash buckets that differ between local database and API
+        
+        Args:
+            api_client: API client
+            sync_service: Sync service of the OpenLP database
+            throttle: Optional governor callback pacing bucket and song downloads
+        
+        Returns:
+            Tuple (songs to sync, backend IDs deleted remotely or outside the sync
+            scope), or None when the drift is too large and the full paginated
+            download is cheaper
+        """
+        self.progress.emit("Porównywanie sum kontrolnych z API...")
+        manifest = api_client.fetch_hash_manifest(scope=self.scope)
+        prefix_length = manifest.get('prefixLength', DEFAULT_BUCKET_PREFIX_LENGTH)
+        remote_buckets = manifest.get('buckets', {})
+        # The manifest only covers the scope - compare against scoped local songs
+        local_entries = sync_service.get_local_hash_entries(self.scope)
+        out_of_scope_ids = set()
+        if self.scope:
+            out_of_scope_ids = set(sync_service.get_local_hash_entries()) - set(local_entries)
+        
+        # E.g. first reconcile after upgrade - rows have no hashes yet
+        mismatched = mismatched_buckets(build_hash_manifest(local_entries, prefix_length), remote_buckets)
+        if len(mismatched) > len(remote_buckets) * self.RECONCILE_MAX_BUCKET_RATIO:
+            log.info(f"Reconciliation: {len(mismatched)}/{len(remote_buckets)} buckets differ, "
+                     f"falling back to full download")
+            return None
+        
+        def fetch_bucket(bucket: str) -> Dict[str, str]:
+            started = time.monotonic()
+            entries = api_client.fetch_hash_bucket(bucket, self.scope)
+            if throttle:
+                # A bucket of hashes is one small request, not len(entries) songs
+                throttle(time.monotonic() - started, 1)
+            return entries
+        
+        drift = find_drift(local_entries, remote_buckets, fetch_bucket, prefix_length, out_of_scope_ids)
+        song_ids = drift['refetch']
+        log.info(f"Reconciliation found {len(song_ids)} drifted and {len(drift['deleted'])} deleted songs")
+        
+        if len(song_ids) > self.RECONCILE_MAX_SONG_FETCHES:
+            log.info("Reconciliation: too many drifted songs, falling back to full download")
+            return None
+        
+        songs = []
+        if song_ids:
+            self.progress.emit(f"Pobieranie {len(song_ids)} rozbieżnych pieśni z API...")
+            songs = self.fetch_songs_by_ids(api_client, song_ids, throttle)
+        return songs, set(drift['deleted'])
+    
+    def fetch_songs_by_ids(self, api_client: ApiClient, song_ids: list,
+                           throttle: Optional[Callable[[float, int], None]] = None) -> list:
+        """Fetch songs one by one, counting the ones that failed as errors"""
+        songs, failed_ids = api_client.fetch_songs_by_ids(song_ids, throttle)
+        if failed_ids:
+            self.failed_ids.update(failed_ids)
+            self.errors += len(failed_ids)
+        return songs
+    
     def cancel(self):
         """Cancel the sync operation"""
         self.cancelled = True
@@ -69,7 +356,9 @@ class SyncWorker(QThread):
 class SyncDialog(QDialog):
     """Dialog for sync progress"""
     
-    def __init__(self, parent, api_url: str, api_key: Optional[str], db_path: str):
+    def __init__(self, parent, api_url: str, api_key: Optional[str], db_path: str, priority_sync: bool = False,
+                 reconcile: bool = False, full_refresh: bool = False, scope: Optional[Dict[str, Any]] = None,
+                 governor_settings: Optional[Dict[str, Any]] = None):
         super().__init__(parent)
         self.setWindowTitle("Synchronizacja pieśni")
         self.setMinimumWidth(400)
@@ -87,18 +376,43 @@ class SyncDialog(QDialog):
         self.cancel_button.clicked.connect(self.cancel_sync)
         layout.addWidget(self.cancel_button)
         
+        self.background_button = QPushButton("Kontynuuj w tle")
+        self.background_button.clicked.connect(self.hide)
+        # A paced sync may wait for the live slide - let it run in the background from the start
+        self.background_button.setVisible(bool(governor_settings))
+        layout.addWidget(self.background_button)
+        
         self.setLayout(layout)
         
         # Start sync worker
-        self.worker = SyncWorker(api_url, api_key, db_path)
+        self.worker = SyncWorker(api_url, api_key, db_path, priority_sync, reconcile, full_refresh, scope,
+                                 governor_settings)
         self.worker.progress.connect(self.update_progress)
+        self.worker.priority_finished.connect(self.priority_sync_finished)
+        self.worker.songs_changed.connect(refresh_openlp_songs)
         self.worker.finished.connect(self.sync_finished)
+        
+        # Live controller may only be read in the GUI thread - poll it for the governor
+        self.live_timer = QTimer(self)
+        self.live_timer.timeout.connect(self.update_live_state)
+        if governor_settings:
+            self.live_timer.start(500)
+        
         self.worker.start()
     
+    def update_live_state(self):
+        """Pass live controller state to the worker"""
+        self.worker.live_presenting = is_live_presenting()
+    
     def update_progress(self, message: str):
         """Update progress message"""
         self.status_label.setText(message)
     
+    def priority_sync_finished(self, count: int):
+        """Service plan songs are ready - allow hiding the dialog"""
+        self.status_label.setText(f"Pieśni z planu nabożeństwa gotowe ({count}). Synchronizacja reszty w tle...")
+        self.background_button.setVisible(True)
+    
     def cancel_sync(self):
         """Cancel the sync operation"""
         self.worker.cancel()
@@ -107,6 +421,8 @@ class SyncDialog(QDialog):
     
     def sync_finished(self, success: bool, message: str):
         """Handle sync completion"""
+        self.live_timer.stop()
+        self.background_button.setVisible(False)
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(100)
         self.cancel_button.setText("Zamknij")
@@ -136,6 +452,7 @@ class OpenLPSyncPlugin(Plugin):
         self.weight = 0
         self.icon_path = ':/plugins/openlp_sync_plugin/icon.png'
         self.settings_tab = None
+        self.sync_dialog = None
     
     def initialise(self):
         """Initialize the plugin"""
@@ -196,6 +513,9 @@ class OpenLPSyncPlugin(Plugin):
         api_url = Settings().value('openlp_sync_plugin/api_url')
         api_key = Settings().value('openlp_sync_plugin/api_key')
         db_path = Settings().value('openlp_sync_plugin/db_path')
+        priority_sync = str(Settings().value('openlp_sync_plugin/priority_sync')).lower() == 'true'
+        reconcile = str(Settings().value('openlp_sync_plugin/reconcile')).lower() == 'true'
+        full_refresh = str(Settings().value('openlp_sync_plugin/full_refresh')).lower() == 'true'
         
         if not api_url:
             QMessageBox.warning(
@@ -230,9 +550,22 @@ class OpenLPSyncPlugin(Plugin):
                 )
                 return
         
-        # Show sync dialog
-        dialog = SyncDialog(None, api_url, api_key, db_path)
-        dialog.exec_()
+        if self.sync_dialog and self.sync_dialog.worker.isRunning():
+            # A sync is still running in the background - just bring it back
+            self.sync_dialog.show()
+            return
+        
+        # Show sync dialog (kept on the plugin so it survives being hidden)
+        governor_settings = get_governor_settings()
+        self.sync_dialog = SyncDialog(None, api_url, api_key, db_path, priority_sync, reconcile,
+                                      full_refresh, get_sync_scope(), governor_settings)
+        if governor_settings:
+            # The governor pauses while a slide is live - the operator must be able
+            # to blank the screen or change slides, so don't block the main window
+            self.sync_dialog.setModal(False)
+            self.sync_dialog.show()
+        else:
+            self.sync_dialog.exec_()
     
     def on_settings_clicked(self):
         """Handle settings button click"""
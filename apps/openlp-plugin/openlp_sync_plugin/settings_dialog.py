@@ -4,11 +4,14 @@ Settings dialog for OpenLP Sync Plugin
 
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QFileDialog, QMessageBox, QFormLayout
+    QPushButton, QFileDialog, QMessageBox, QFormLayout, QCheckBox, QComboBox, QSpinBox
 )
 from PyQt5.QtCore import Qt
 from openlp.core.common import Settings
 
+# Songbooks supported by the API songbook filter
+SONGBOOKS = ['pielgrzym', 'zielony', 'wedrowiec', 'zborowe']
+
 
 class SettingsDialog(QDialog):
     """Settings dialog for plugin configuration"""
@@ -41,6 +44,48 @@ class SettingsDialog(QDialog):
         db_layout.addWidget(db_browse_btn)
         layout.addRow("Ścieżka do bazy danych:", db_layout)
         
+        # Priority sync of service plan songs
+        self.priority_sync_check = QCheckBox("Najpierw synchronizuj pieśni z planu nabożeństwa")
+        layout.addRow("", self.priority_sync_check)
+        
+        # Reconciliation - refetch only songs that differ from the API
+        self.reconcile_check = QCheckBox("Pobieraj tylko rozbieżne pieśni (porównanie sum kontrolnych)")
+        layout.addRow("", self.reconcile_check)
+        
+        # Full refresh - rebuild songs table in a staging table and swap it in
+        self.full_refresh_check = QCheckBox("Pełne odświeżenie biblioteki (podmiana całej tabeli)")
+        layout.addRow("", self.full_refresh_check)
+        
+        # Sync scope - only a subset of the catalog
+        self.scope_songbook_combo = QComboBox()
+        self.scope_songbook_combo.addItem("Wszystkie", "")
+        for songbook in SONGBOOKS:
+            self.scope_songbook_combo.addItem(songbook, songbook)
+        layout.addRow("Śpiewnik:", self.scope_songbook_combo)
+        
+        self.scope_language_edit = QLineEdit()
+        self.scope_language_edit.setPlaceholderText("Wszystkie (np. pl)")
+        layout.addRow("Język:", self.scope_language_edit)
+        
+        self.scope_tags_edit = QLineEdit()
+        self.scope_tags_edit.setPlaceholderText("Wszystkie - tagi oddzielone przecinkami")
+        layout.addRow("Tagi:", self.scope_tags_edit)
+        
+        # Resource governor - pace sync and pause while slides are live
+        self.throttle_check = QCheckBox("Ogranicz zużycie zasobów i wstrzymuj podczas prezentacji")
+        layout.addRow("", self.throttle_check)
+        
+        self.cpu_budget_spin = QSpinBox()
+        self.cpu_budget_spin.setRange(5, 100)
+        self.cpu_budget_spin.setSuffix(" %")
+        layout.addRow("Limit CPU:", self.cpu_budget_spin)
+        
+        self.io_budget_spin = QSpinBox()
+        self.io_budget_spin.setRange(0, 10000)
+        self.io_budget_spin.setSuffix(" pieśni/s")
+        self.io_budget_spin.setSpecialValueText("Bez limitu")
+        layout.addRow("Limit pobierania i zapisu:", self.io_budget_spin)
+        
         # Buttons
         button_layout = QHBoxLayout()
         button_layout.addStretch()
@@ -79,6 +124,32 @@ class SettingsDialog(QDialog):
         db_path = settings.value('openlp_sync_plugin/db_path')
         if db_path:
             self.db_path_edit.setText(db_path)
+        
+        priority_sync = settings.value('openlp_sync_plugin/priority_sync')
+        self.priority_sync_check.setChecked(str(priority_sync).lower() == 'true')
+        
+        reconcile = settings.value('openlp_sync_plugin/reconcile')
+        self.reconcile_check.setChecked(str(reconcile).lower() == 'true')
+        
+        full_refresh = settings.value('openlp_sync_plugin/full_refresh')
+        self.full_refresh_check.setChecked(str(full_refresh).lower() == 'true')
+        
+        songbook = settings.value('openlp_sync_plugin/scope_songbook')
+        index = self.scope_songbook_combo.findData(songbook or "")
+        self.scope_songbook_combo.setCurrentIndex(max(index, 0))
+        
+        language = settings.value('openlp_sync_plugin/scope_language')
+        if language:
+            self.scope_language_edit.setText(language)
+        
+        tags = settings.value('openlp_sync_plugin/scope_tags')
+        if tags:
+            self.scope_tags_edit.setText(tags)
+        
+        throttle = settings.value('openlp_sync_plugin/throttle')
+        self.throttle_check.setChecked(str(throttle).lower() == 'true')
+        self.cpu_budget_spin.setValue(int(settings.value('openlp_sync_plugin/cpu_budget') or 50))
+        self.io_budget_spin.setValue(int(settings.value('openlp_sync_plugin/io_budget') or 0))
     
     def save_settings(self):
         """Save settings to OpenLP settings"""
@@ -108,6 +179,24 @@ class SettingsDialog(QDialog):
         else:
             settings.remove('openlp_sync_plugin/db_path')
         
+        settings.setValue('openlp_sync_plugin/priority_sync', self.priority_sync_check.isChecked())
+        settings.setValue('openlp_sync_plugin/reconcile', self.reconcile_check.isChecked())
+        settings.setValue('openlp_sync_plugin/full_refresh', self.full_refresh_check.isChecked())
+        
+        for key, value in (
+            ('scope_songbook', self.scope_songbook_combo.currentData()),
+            ('scope_language', self.scope_language_edit.text().strip()),
+            ('scope_tags', self.scope_tags_edit.text().strip()),
+        ):
+            if value:
+                settings.setValue(f'openlp_sync_plugin/{key}', value)
+            else:
+                settings.remove(f'openlp_sync_plugin/{key}')
+        
+        settings.setValue('openlp_sync_plugin/throttle', self.throttle_check.isChecked())
+        settings.setValue('openlp_sync_plugin/cpu_budget', self.cpu_budget_spin.value())
+        settings.setValue('openlp_sync_plugin/io_budget', self.io_budget_spin.value())
+        
         QMessageBox.information(self, "Sukces", "Ustawienia zostały zapisane")
         self.accept()
     
@@ -4,92 +4,488 @@ Service for syncing songs to OpenLP database
 
 import logging
 import sqlite3
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Set, Iterable
 import json
 import re
+import time
 from datetime import datetime
 
+from .hash_manifest import song_content_hash, row_hash
+from .governor import ResourceGovernor
+
 log = logging.getLogger(__name__)
 
 
 class SyncService:
     """Service for syncing songs to OpenLP SQLite database"""
     
-    def __init__(self, db_path: str):
+    # OpenLP keeps the same database open - commit often and wait for its locks
+    BATCH_SIZE = 50
+    BUSY_TIMEOUT = 10.0  # seconds
+    MAX_LOCK_RETRIES = 3
+    STAGING_TABLE = 'songs_staging'
+    SNAPSHOT_TABLE = 'songs_snapshot'  # TEMP table, dropped with the connection
+    NAMED_SONGBOOKS = ('pielgrzym', 'zielony', 'wedrowiec')  # 'zborowe' scope means none of these
+    
+    def __init__(self, db_path: str, batch_size: int = BATCH_SIZE, governor: Optional[ResourceGovernor] = None):
         """
         Initialize sync service
         
         Args:
             db_path: Path to OpenLP SQLite database file
+            batch_size: Number of songs written per transaction
+            governor: Optional resource governor pacing the batches
         """
         self.db_path = db_path
+        self.batch_size = batch_size
+        self.governor = governor
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open database connection with busy timeout"""
+        conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.BUSY_TIMEOUT * 1000)}")
+        return conn
     
     def sync_songs(
         self,
         songs: List[Dict[str, Any]],
-        progress_callback: Optional[Callable[[str], None]] = None
-    ) -> Dict[str, int]:
+        progress_callback: Optional[Callable[[str], None]] = None,
+        keep_ids: Optional[Set[str]] = None
+    ) -> Dict[str, Any]:
         """
         Sync songs to OpenLP database
         
+        Songs are written in short transactions of batch_size songs so OpenLP
+        is never locked out of its database for long.
+        
+        When keep_ids is given, songs is treated as the full catalog: synced
+        songs missing from it (deleted remotely or outside the sync scope) are
+        removed together with their rows in linked tables. Songs created
+        locally in OpenLP are kept. An empty catalog never prunes.
+        
         Args:
             songs: List of song dictionaries from API
             progress_callback: Optional callback for progress updates
+            keep_ids: Backend IDs to keep even though they are not in songs,
+                None to only create and update songs
             
         Returns:
-            Dictionary with sync statistics
+            Dictionary with sync statistics, 'changed_ids' (OpenLP song IDs) and
+            'synced_ids' (backend IDs written), plus 'deleted' when pruning
         """
-        result = {
-            'created': 0,
-            'updated': 0,
-            'errors': 0
-        }
-        
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            conn = self._connect()
+            try:
+                self._drop_stale_staging_table(conn)
+                result = self._sync_in_batches(conn, songs, 'songs', progress_callback)
+                
+                if keep_ids is not None:
+                    pruned_ids = []
+                    if self._should_prune(songs, keep_ids):
+                        catalog_ids = {song.get('id') for song in songs} | keep_ids
+                        pruned_ids = [openlp_id for backend_id, openlp_id
+                                      in self._get_existing_songs(conn.cursor()).items()
+                                      if backend_id not in catalog_ids]
+                    if pruned_ids and progress_callback:
+                        progress_callback(f"Usuwanie {len(pruned_ids)} pieśni spoza katalogu...")
+                    self._delete_song_rows(conn, pruned_ids)
+                    result['deleted'] = len(pruned_ids)
+                    result['changed_ids'].extend(pruned_ids)
+            finally:
+                conn.close()
             
-            # Get existing songs with backend IDs
-            existing_songs = self._get_existing_songs(cursor)
+        except Exception as e:
+            log.exception("Error during sync")
+            raise Exception(f"Błąd podczas synchronizacji: {str(e)}")
+        
+        return result
+    
+    def full_refresh(
+        self,
+        songs: List[Dict[str, Any]],
+        progress_callback: Optional[Callable[[str], None]] = None,
+        keep_ids: Optional[Set[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Rebuild the songs table from the catalog and swap it in atomically
+        
+        The current songs are copied into a staging table (keeping their OpenLP
+        IDs, so service files keep working), the catalog is loaded into it in
+        batches and indexes are built afterwards. Readers keep seeing the old
+        table until the single swap transaction. On error the live table is
+        left untouched.
+        
+        When keep_ids is given, synced songs missing from the catalog (deleted
+        remotely or outside the sync scope) are removed together with their
+        rows in linked tables. Songs created locally in OpenLP are kept. An
+        empty catalog never prunes.
+        
+        Songs created, edited or deleted in OpenLP while the staging table is
+        being loaded are carried over to it during the swap, see
+        _merge_live_changes.
+        
+        Args:
+            songs: Full list of song dictionaries from API
+            progress_callback: Optional callback for progress updates
+            keep_ids: Backend IDs to keep even though they are not in songs,
+                None to keep all synced songs
             
-            for idx, song in enumerate(songs):
-                try:
-                    if progress_callback:
-                        progress_callback(f"Przetwarzanie pieśni {idx + 1}/{len(songs)}: {song.get('title', 'Bez tytułu')}")
-                    
-                    song_id = song.get('id')
-                    if not song_id:
-                        log.warning(f"Song missing ID: {song.get('title')}")
-                        result['errors'] += 1
-                        continue
-                    
-                    # Check if song already exists
-                    openlp_id = existing_songs.get(song_id)
-                    
-                    if openlp_id:
-                        # Update existing song
-                        self._update_song(cursor, openlp_id, song)
-                        result['updated'] += 1
-                    else:
-                        # Insert new song
-                        self._insert_song(cursor, song)
-                        result['created'] += 1
-                    
-                except Exception as e:
-                    log.exception(f"Error syncing song {song.get('title', 'Unknown')}: {e}")
-                    result['errors'] += 1
+        Returns:
+            Dictionary with sync statistics (including 'deleted'), 'changed_ids'
+            and 'synced_ids'
+        """
+        staging = self.STAGING_TABLE
+        prune = self._should_prune(songs, keep_ids)
+        catalog_ids = {song.get('id') for song in songs} | (keep_ids or set())
+        
+        try:
+            conn = self._connect()
+            try:
+                if progress_callback:
+                    progress_callback("Przygotowywanie tabeli tymczasowej...")
+                table_sql, index_sqls = self._get_songs_schema(conn)
+                
+                conn.execute(f"DROP TABLE IF EXISTS {staging}")
+                conn.execute(re.sub(r'^CREATE TABLE\s+["`]?songs["`]?', f'CREATE TABLE {staging}',
+                                    table_sql, flags=re.IGNORECASE))
+                # Copy and snapshot in one transaction - the swap compares the live table with it
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(f"CREATE TEMP TABLE {self.SNAPSHOT_TABLE} AS SELECT id, last_modified FROM songs")
+                conn.execute(f"INSERT INTO {staging} SELECT * FROM songs")
+                conn.commit()
+                
+                result = self._sync_in_batches(conn, songs, staging, progress_callback)
+                
+                existing_songs = self._get_existing_songs(conn.cursor(), staging)
+                pruned_ids = [openlp_id for backend_id, openlp_id in existing_songs.items()
+                              if prune and backend_id not in catalog_ids]
+                for start in range(0, len(pruned_ids), self.batch_size):
+                    batch = pruned_ids[start:start + self.batch_size]
+                    conn.execute(f"DELETE FROM {staging} WHERE id IN ({','.join('?' * len(batch))})", batch)
+                    conn.commit()
+                result['deleted'] = len(pruned_ids)
+                
+                if progress_callback:
+                    progress_callback("Podmiana tabeli pieśni...")
+                moved_ids = self._swap_staging_table(conn, index_sqls, pruned_ids)
+                result['changed_ids'] = [moved_ids.get(song_id, song_id) for song_id in result['changed_ids']]
+                result['changed_ids'].extend(pruned_ids)
+            except Exception:
+                conn.rollback()
+                conn.execute(f"DROP TABLE IF EXISTS {staging}")
+                conn.commit()
+                raise
+            finally:
+                conn.close()
             
+        except Exception as e:
+            log.exception("Error during full refresh")
+            raise Exception(f"Błąd podczas pełnej synchronizacji: {str(e)}")
+        
+        return result
+    
+    def _should_prune(self, songs: List[Dict[str, Any]], keep_ids: Optional[Set[str]]) -> bool:
+        """Prune only on request, and never everything because of an empty catalog"""
+        if keep_ids is None:
+            return False
+        if not songs:
+            log.warning("Catalog is empty, not removing any synced songs")
+            return False
+        return True
+    
+    def _drop_stale_staging_table(self, conn: sqlite3.Connection):
+        """Drop a staging table left behind by a full refresh that crashed before the swap"""
+        if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.STAGING_TABLE,)
+        ).fetchone():
+            log.info("Dropping stale staging table")
+            conn.execute(f"DROP TABLE {self.STAGING_TABLE}")
             conn.commit()
-            conn.close()
+    
+    def _get_songs_schema(self, conn: sqlite3.Connection):
+        """
+        Get CREATE statements of the songs table and of its indexes/triggers
+        
+        Returns:
+            Tuple (table_sql, [index_or_trigger_sql, ...])
+        """
+        rows = conn.execute(
+            "SELECT type, sql FROM sqlite_master WHERE tbl_name = 'songs' AND sql IS NOT NULL"
+        ).fetchall()
+        table_sql = next(row['sql'] for row in rows if row['type'] == 'table')
+        index_sqls = [row['sql'] for row in rows if row['type'] != 'table']
+        return table_sql, index_sqls
+    
+    def _swap_staging_table(
+        self,
+        conn: sqlite3.Connection,
+        index_sqls: List[str],
+        pruned_ids: List[int]
+    ) -> Dict[int, int]:
+        """
+        Replace the songs table with the staging table in one short transaction
+        
+        Changes made in OpenLP since the staging copy are merged in first.
+        Dropping songs (instead of renaming it away) keeps foreign keys of
+        other tables pointing at "songs". Indexes are created under their
+        original names once the old ones are gone. Rows of linked tables
+        (authors_songs, songs_topics, ...) pointing at pruned songs are deleted.
+        
+        Returns:
+            Staging song IDs moved to avoid collisions (old -> new)
+        """
+        for attempt in range(1, self.MAX_LOCK_RETRIES + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                moved_ids = self._merge_live_changes(conn)
+                conn.execute("DROP TABLE songs")
+                conn.execute(f"ALTER TABLE {self.STAGING_TABLE} RENAME TO songs")
+                for sql in index_sqls:
+                    conn.execute(sql)
+                if pruned_ids:
+                    self._delete_linked_rows(conn, pruned_ids)
+                conn.commit()
+                return moved_ids
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                if 'locked' not in str(e) or attempt == self.MAX_LOCK_RETRIES:
+                    raise
+                log.warning(f"Database locked, retrying table swap ({attempt}/{self.MAX_LOCK_RETRIES})")
+                time.sleep(attempt)
+    
+    def _merge_live_changes(self, conn: sqlite3.Connection) -> Dict[int, int]:
+        """
+        Carry songs created, edited or deleted in OpenLP during the load over to staging
+        
+        The live table is compared with the snapshot taken together with the
+        staging copy: new IDs are created songs, a different last_modified
+        means an edit and missing IDs were deleted. Both tables hand out row
+        IDs independently, so a catalog song inserted into staging under an ID
+        OpenLP used for a new song meanwhile is moved to a free ID - it has no
+        linked rows yet, while OpenLP's song may have. Edits of songs pruned
+        from staging are dropped with them.
+        
+        Must run inside the swap transaction.
+        
+        Returns:
+            Staging song IDs moved to avoid collisions (old -> new)
+        """
+        staging = self.STAGING_TABLE
+        snapshot = f"temp.{self.SNAPSHOT_TABLE}"
+        
+        created_ids = [row['id'] for row in conn.execute(
+            f"SELECT id FROM songs WHERE id NOT IN (SELECT id FROM {snapshot})"
+        ).fetchall()]
+        moved_ids = {}
+        for song_id in created_ids:
+            if not conn.execute(f"SELECT 1 FROM {staging} WHERE id = ?", (song_id,)).fetchone():
+                continue
+            new_id = conn.execute(
+                f"SELECT MAX(COALESCE((SELECT MAX(id) FROM songs), 0), "
+                f"COALESCE((SELECT MAX(id) FROM {staging}), 0)) + 1"
+            ).fetchone()[0]
+            conn.execute(f"UPDATE {staging} SET id = ? WHERE id = ?", (new_id, song_id))
+            moved_ids[song_id] = new_id
+        if moved_ids:
+            log.info(f"Moved {len(moved_ids)} staged songs to free IDs taken by songs created in OpenLP")
+        
+        conn.execute(f"""
+            DELETE FROM {staging}
+            WHERE id IN (SELECT id FROM {snapshot}) AND id NOT IN (SELECT id FROM songs)
+        """)
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {staging}
+            SELECT songs.* FROM songs LEFT JOIN {snapshot} AS snapshot ON snapshot.id = songs.id
+            WHERE snapshot.id IS NULL
+               OR (songs.last_modified IS NOT snapshot.last_modified
+                   AND songs.id IN (SELECT id FROM {staging}))
+        """)
+        return moved_ids
+    
+    def delete_songs(self, backend_ids: Iterable[str]) -> List[int]:
+        """
+        Delete synced songs and their rows in linked tables
+        
+        Args:
+            backend_ids: Backend IDs of the songs to delete
+            
+        Returns:
+            OpenLP IDs of the deleted songs
+        """
+        backend_ids = set(backend_ids)
+        if not backend_ids:
+            return []
+        
+        try:
+            conn = self._connect()
+            try:
+                existing_songs = self._get_existing_songs(conn.cursor())
+                song_ids = [openlp_id for backend_id, openlp_id in existing_songs.items()
+                            if backend_id in backend_ids]
+                self._delete_song_rows(conn, song_ids)
+            finally:
+                conn.close()
             
         except Exception as e:
-            log.exception("Error during sync")
-            raise Exception(f"Błąd podczas synchronizacji: {str(e)}")
+            log.exception("Error deleting songs")
+            raise Exception(f"Błąd podczas usuwania pieśni: {str(e)}")
+        
+        return song_ids
+    
+    def _delete_song_rows(self, conn: sqlite3.Connection, song_ids: List[int]):
+        """Delete songs and their linked rows by OpenLP ID, committing per batch"""
+        for start in range(0, len(song_ids), self.batch_size):
+            batch = song_ids[start:start + self.batch_size]
+            conn.execute(f"DELETE FROM songs WHERE id IN ({','.join('?' * len(batch))})", batch)
+            self._delete_linked_rows(conn, batch)
+            conn.commit()
+    
+    def _delete_linked_rows(self, conn: sqlite3.Connection, song_ids: List[int]):
+        """Delete rows of tables with a foreign key to songs for the given song IDs"""
+        tables = [row['name'] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'songs'"
+        ).fetchall()]
+        for table in tables:
+            for fk in conn.execute(f'PRAGMA foreign_key_list("{table}")').fetchall():
+                if fk['table'] != 'songs':
+                    continue
+                for start in range(0, len(song_ids), self.batch_size):
+                    batch = song_ids[start:start + self.batch_size]
+                    conn.execute(
+                        f'DELETE FROM "{table}" WHERE "{fk["from"]}" IN ({",".join("?" * len(batch))})',
+                        batch
+                    )
+    
+    def _sync_in_batches(
+        self,
+        conn: sqlite3.Connection,
+        songs: List[Dict[str, Any]],
+        table: str,
+        progress_callback: Optional[Callable[[str], None]]
+    ) -> Dict[str, Any]:
+        """Write songs to the given table in short committed batches"""
+        result = {
+            'created': 0,
+            'updated': 0,
+            'unchanged': 0,
+            'errors': 0,
+            'changed_ids': [],
+            'synced_ids': []
+        }
+        
+        # Get existing songs with backend IDs
+        existing_songs = self._get_existing_songs(conn.cursor(), table)
+        
+        for start in range(0, len(songs), self.batch_size):
+            batch = songs[start:start + self.batch_size]
+            started = time.monotonic()
+            batch_result = self._sync_batch_with_retry(
+                conn, batch, table, start, len(songs), existing_songs, progress_callback
+            )
+            # Batch is committed - remember new songs for the rest of the run
+            existing_songs.update(batch_result.pop('inserted'))
+            for key, value in batch_result.items():
+                result[key] += value
+            
+            if self.governor:
+                self.governor.throttle(time.monotonic() - started, len(batch))
+        
+        return result
+    
+    def _sync_batch_with_retry(
+        self,
+        conn: sqlite3.Connection,
+        batch: List[Dict[str, Any]],
+        table: str,
+        offset: int,
+        total: int,
+        existing_songs: Dict[str, int],
+        progress_callback: Optional[Callable[[str], None]]
+    ) -> Dict[str, Any]:
+        """
+        Write one batch in its own transaction, retrying if the database stays locked
+        """
+        for attempt in range(1, self.MAX_LOCK_RETRIES + 1):
+            try:
+                batch_result = self._sync_batch(conn, batch, table, offset, total, existing_songs,
+                                                progress_callback)
+                conn.commit()
+                return batch_result
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                if 'locked' not in str(e) or attempt == self.MAX_LOCK_RETRIES:
+                    raise
+                log.warning(f"Database locked, retrying batch at {offset} ({attempt}/{self.MAX_LOCK_RETRIES})")
+                time.sleep(attempt)
+    
+    def _sync_batch(
+        self,
+        conn: sqlite3.Connection,
+        batch: List[Dict[str, Any]],
+        table: str,
+        offset: int,
+        total: int,
+        existing_songs: Dict[str, int],
+        progress_callback: Optional[Callable[[str], None]]
+    ) -> Dict[str, Any]:
+        """Write one batch of songs without committing"""
+        result = {
+            'created': 0,
+            'updated': 0,
+            'unchanged': 0,
+            'errors': 0,
+            'changed_ids': [],
+            'synced_ids': [],
+            'inserted': {}
+        }
+        cursor = conn.cursor()
+        
+        for idx, song in enumerate(batch, start=offset):
+            try:
+                if progress_callback:
+                    progress_callback(f"Przetwarzanie pieśni {idx + 1}/{total}: {song.get('title', 'Bez tytułu')}")
+                
+                song_id = song.get('id')
+                if not song_id:
+                    log.warning(f"Song missing ID: {song.get('title')}")
+                    result['errors'] += 1
+                    continue
+                
+                # Check if song already exists
+                openlp_id = existing_songs.get(song_id) or result['inserted'].get(song_id)
+                
+                if openlp_id and self._is_unchanged(cursor, openlp_id, song, table):
+                    # Nothing to write - keep the row (and OpenLP's cached song) as is
+                    result['unchanged'] += 1
+                    result['synced_ids'].append(song_id)
+                    continue
+                
+                if openlp_id:
+                    # Update existing song
+                    self._update_song(cursor, openlp_id, song, table)
+                    result['updated'] += 1
+                else:
+                    # Insert new song
+                    openlp_id = self._insert_song(cursor, song, table)
+                    result['inserted'][song_id] = openlp_id
+                    result['created'] += 1
+                result['changed_ids'].append(openlp_id)
+                result['synced_ids'].append(song_id)
+                
+            except sqlite3.OperationalError as e:
+                if 'locked' in str(e):
+                    # Let the whole batch be retried
+                    raise
+                log.exception(f"Error syncing song {song.get('title', 'Unknown')}: {e}")
+                result['errors'] += 1
+            except Exception as e:
+                log.exception(f"Error syncing song {song.get('title', 'Unknown')}: {e}")
+                result['errors'] += 1
         
         return result
     
-    def _get_existing_songs(self, cursor: sqlite3.Cursor) -> Dict[str, int]:
+    def _get_existing_songs(self, cursor: sqlite3.Cursor, table: str = 'songs') -> Dict[str, int]:
         """
         Get mapping of backend IDs to OpenLP IDs from comments field
         
@@ -99,7 +495,7 @@ class SyncService:
         mapping = {}
         
         try:
-            cursor.execute("SELECT id, comments FROM songs WHERE comments IS NOT NULL")
+            cursor.execute(f"SELECT id, comments FROM {table} WHERE comments IS NOT NULL")
             rows = cursor.fetchall()
             
             for row in rows:
@@ -121,8 +517,37 @@ class SyncService:
         
         return mapping
     
-    def _insert_song(self, cursor: sqlite3.Cursor, song: Dict[str, Any]):
-        """Insert a new song into OpenLP database"""
+    def _is_unchanged(self, cursor: sqlite3.Cursor, openlp_id: int, song: Dict[str, Any], table: str) -> bool:
+        """
+        Check whether the row already holds this version of the song
+        
+        The stored contentHash must match the API song, localHash the current
+        row (no edits in OpenLP since the last sync) and the scope fields the
+        song's songbook, language and tags.
+        """
+        row = cursor.execute(f"""
+            SELECT title, alternate_title, lyrics, copyright, ccli_number, comments
+            FROM {table} WHERE id = ?
+        """, (openlp_id,)).fetchone()
+        if not row:
+            return False
+        try:
+            metadata = json.loads(row['comments'])
+        except (json.JSONDecodeError, TypeError):
+            return False
+        if not isinstance(metadata, dict):
+            return False
+        
+        current = row_hash((row['title'], row['alternate_title'], row['lyrics'],
+                            row['copyright'], row['ccli_number']))
+        return (metadata.get('contentHash') == song_content_hash(song)
+                and metadata.get('localHash') == current
+                and metadata.get('songbook') == song.get('songbook')
+                and metadata.get('language') == song.get('language')
+                and metadata.get('tags') == self._tag_names(song))
+    
+    def _insert_song(self, cursor: sqlite3.Cursor, song: Dict[str, Any], table: str = 'songs') -> int:
+        """Insert a new song into OpenLP database and return its OpenLP ID"""
         title = song.get('title', '')
         number = song.get('number')
         copyright = song.get('copyright')
@@ -131,14 +556,10 @@ class SyncService:
         search_title = title.lower().strip()
         search_lyrics = lyrics.lower() if lyrics else ''
         
-        # Store backend ID in comments as JSON
-        comments = json.dumps({
-            'backendId': song.get('id'),
-            'lastSynced': datetime.now().isoformat()
-        })
+        comments = self._build_comments(song, title, number, lyrics, copyright, ccli_number)
         
-        cursor.execute("""
-            INSERT INTO songs (
+        cursor.execute(f"""
+            INSERT INTO {table} (
                 title, alternate_title, lyrics, copyright, comments,
                 ccli_number, search_title, search_lyrics, last_modified
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
@@ -152,8 +573,9 @@ class SyncService:
             search_title,
             search_lyrics
         ))
+        return cursor.lastrowid
     
-    def _update_song(self, cursor: sqlite3.Cursor, openlp_id: int, song: Dict[str, Any]):
+    def _update_song(self, cursor: sqlite3.Cursor, openlp_id: int, song: Dict[str, Any], table: str = 'songs'):
         """Update an existing song in OpenLP database"""
         title = song.get('title', '')
         number = song.get('number')
@@ -163,14 +585,10 @@ class SyncService:
         search_title = title.lower().strip()
         search_lyrics = lyrics.lower() if lyrics else ''
         
-        # Update comments with backend ID
-        comments = json.dumps({
-            'backendId': song.get('id'),
-            'lastSynced': datetime.now().isoformat()
-        })
+        comments = self._build_comments(song, title, number, lyrics, copyright, ccli_number)
         
-        cursor.execute("""
-            UPDATE songs
+        cursor.execute(f"""
+            UPDATE {table}
             SET title = ?, alternate_title = ?, lyrics = ?, copyright = ?,
                 comments = ?, ccli_number = ?, search_title = ?, search_lyrics = ?,
                 last_modified = datetime('now')
@@ -187,6 +605,96 @@ class SyncService:
             openlp_id
         ))
     
+    def _build_comments(self, song: Dict[str, Any], *row_values: Any) -> str:
+        """
+        Build comments JSON storing the backend ID, content hashes and scope fields
+        
+        contentHash is the API hash of the synced song, localHash covers the
+        values written to the row so later local edits can be detected.
+        songbook, language and tags let reconciliation filter by sync scope.
+        """
+        return json.dumps({
+            'backendId': song.get('id'),
+            'lastSynced': datetime.now().isoformat(),
+            'contentHash': song_content_hash(song),
+            'localHash': row_hash(row_values),
+            'songbook': song.get('songbook'),
+            'language': song.get('language'),
+            'tags': self._tag_names(song)
+        })
+    
+    def _tag_names(self, song: Dict[str, Any]) -> List[str]:
+        """Tag names of an API song (tags come as {id, name} objects)"""
+        return [tag.get('name') if isinstance(tag, dict) else tag for tag in song.get('tags') or []]
+    
+    def _in_scope(self, metadata: Dict[str, Any], scope: Dict[str, Any]) -> bool:
+        """
+        Check stored song metadata against the sync scope, using the API filter rules
+        
+        Songs synced before scope fields were stored are treated as in scope.
+        """
+        songbook = scope.get('songbook')
+        if songbook and 'songbook' in metadata:
+            if songbook == 'zborowe':
+                if metadata['songbook'] in self.NAMED_SONGBOOKS:
+                    return False
+            elif metadata['songbook'] != songbook:
+                return False
+        
+        language = scope.get('language')
+        if language and 'language' in metadata and metadata['language'] != language:
+            return False
+        
+        tags = scope.get('tags')
+        if tags and 'tags' in metadata and not set(tags) & set(metadata['tags']):
+            return False
+        
+        return True
+    
+    def get_local_hash_entries(self, scope: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """
+        Get content hashes of synced songs for reconciliation
+        
+        Songs edited in OpenLP after the last sync (or synced before hashes
+        were stored) get an empty hash so their bucket never matches.
+        
+        Args:
+            scope: Sync scope (songbook, language, tags), songs outside it are skipped
+            
+        Returns:
+            Dictionary mapping backend_id -> content hash
+        """
+        entries = {}
+        
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT title, alternate_title, lyrics, copyright, ccli_number, comments
+                FROM songs WHERE comments IS NOT NULL
+            """)
+            for row in cursor.fetchall():
+                try:
+                    metadata = json.loads(row['comments'])
+                    backend_id = metadata.get('backendId')
+                except (json.JSONDecodeError, TypeError, AttributeError):
+                    continue
+                if not backend_id:
+                    continue
+                if scope and not self._in_scope(metadata, scope):
+                    continue
+                
+                current = row_hash((row['title'], row['alternate_title'], row['lyrics'],
+                                    row['copyright'], row['ccli_number']))
+                if metadata.get('localHash') == current:
+                    entries[backend_id] = metadata.get('contentHash', '')
+                else:
+                    entries[backend_id] = ''
+        finally:
+            conn.close()
+        
+        return entries
+    
     def _format_lyrics(self, song: Dict[str, Any]) -> str:
         """
         Format song lyrics for OpenLP XML format
@@ -0,0 +1,66 @@
+"""
+Shared fixtures for OpenLP Sync Plugin tests
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Subset of OpenLP's songs.sqlite schema touched by the plugin
+OPENLP_SCHEMA = """
+CREATE TABLE songs (
+    id INTEGER NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    alternate_title VARCHAR(255),
+    lyrics TEXT NOT NULL,
+    verse_order VARCHAR(128),
+    copyright VARCHAR(255),
+    comments TEXT,
+    ccli_number VARCHAR(64),
+    theme_name VARCHAR(128),
+    search_title VARCHAR(255) NOT NULL,
+    search_lyrics TEXT NOT NULL,
+    create_date DATETIME,
+    last_modified DATETIME,
+    temporary BOOLEAN,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_songs_search_title ON songs (search_title);
+CREATE TABLE authors (
+    id INTEGER NOT NULL,
+    display_name VARCHAR(255) NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE TABLE authors_songs (
+    author_id INTEGER NOT NULL,
+    song_id INTEGER NOT NULL,
+    author_type VARCHAR(255) NOT NULL DEFAULT '',
+    PRIMARY KEY (author_id, song_id, author_type),
+    FOREIGN KEY(author_id) REFERENCES authors (id),
+    FOREIGN KEY(song_id) REFERENCES songs (id)
+);
+"""
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path to an empty OpenLP-like songs database"""
+    path = str(tmp_path / 'songs.sqlite')
+    conn = sqlite3.connect(path)
+    conn.executescript(OPENLP_SCHEMA)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def make_song(song_id, title, **fields):
+    """Song dictionary as returned by the API"""
+    song = {'id': song_id, 'title': title, 'number': None, 'copyright': None,
+            'ccliNumber': None, 'verses': f'{title}\n\nrefren'}
+    song.update(fields)
+    return song
@@ -0,0 +1,101 @@
+"""
+Tests for ApiClient catalog download and service plan selection
+"""
+
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from openlp_sync_plugin.api_client import ApiClient
+
+
+@pytest.fixture
+def warsaw_time(monkeypatch):
+    """Run in a timezone ahead of UTC, so late UTC timestamps fall on the next local day"""
+    monkeypatch.setenv('TZ', 'Europe/Warsaw')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def make_client(monkeypatch, active, plans):
+    """ApiClient answering service plan endpoints from the given data"""
+    client = ApiClient('http://localhost:3000/api')
+    by_id = {plan['id']: plan for plan in plans}
+
+    def execute(req):
+        path = req.full_url.split('/api', 1)[1]
+        if path == '/service-plans/active':
+            return active
+        if path == '/service-plans':
+            return plans
+        return by_id[path.rsplit('/', 1)[1]]
+
+    monkeypatch.setattr(client, '_execute', execute)
+    return client
+
+
+def test_active_plan_wins(monkeypatch):
+    plans = [{'id': 'new', 'date': '2999-01-01'}, {'id': 'live', 'date': '2000-01-01'}]
+    client = make_client(monkeypatch, {'servicePlan': {'id': 'live'}}, plans)
+
+    assert client.fetch_upcoming_service_plan()['id'] == 'live'
+
+
+def test_earliest_upcoming_plan_is_used(monkeypatch):
+    today = date.today()
+    plans = [
+        {'id': 'later', 'date': (today + timedelta(days=14)).isoformat()},
+        {'id': 'next', 'date': (today + timedelta(days=3)).isoformat()},
+        {'id': 'past', 'date': (today - timedelta(days=3)).isoformat()},
+    ]
+    client = make_client(monkeypatch, None, plans)
+
+    assert client.fetch_upcoming_service_plan()['id'] == 'next'
+
+
+def test_utc_timestamp_is_compared_as_local_date(monkeypatch, warsaw_time):
+    today = date.today()
+    # Midnight of today in Warsaw, stored by the API as 23:00 (or 22:00) UTC the day before
+    tonight = f"{(today - timedelta(days=1)).isoformat()}T23:00:00.000Z"
+    plans = [
+        {'id': 'later', 'date': (today + timedelta(days=3)).isoformat()},
+        {'id': 'today', 'date': tonight},
+    ]
+    client = make_client(monkeypatch, None, plans)
+
+    assert ApiClient._plan_local_date(tonight) == today
+    assert client.fetch_upcoming_service_plan()['id'] == 'today'
+
+
+def test_falls_back_to_newest_plan(monkeypatch):
+    plans = [{'id': 'newest', 'date': '2001-01-01'}, {'id': 'older', 'date': '2000-01-01'}]
+    client = make_client(monkeypatch, None, plans)
+
+    assert client.fetch_upcoming_service_plan()['id'] == 'newest'
+
+
+def test_no_plans(monkeypatch):
+    assert make_client(monkeypatch, None, []).fetch_upcoming_service_plan() is None
+
+
+def test_plan_local_date_handles_plain_and_invalid_dates():
+    assert ApiClient._plan_local_date('2024-01-15') == date(2024, 1, 15)
+    assert ApiClient._plan_local_date('not a date') is None
+    assert ApiClient._plan_local_date(None) is None
+
+
+def test_fetch_song_catalog_reports_api_total(monkeypatch):
+    client = ApiClient('http://localhost:3000/api')
+    pages = {
+        '1': {'data': [{'id': str(i)} for i in range(100)], 'meta': {'total': 150, 'totalPages': 2}},
+        '2': {'data': [{'id': 'last'}], 'meta': {'total': 150, 'totalPages': 2}},
+    }
+    monkeypatch.setattr(client, '_execute', lambda req: pages[req.full_url.split('page=')[1].split('&')[0]])
+
+    songs, total = client.fetch_song_catalog({'language': 'pl'})
+
+    assert len(songs) == 101
+    assert total == 150
@@ -0,0 +1,70 @@
+"""
+Tests for ResourceGovernor pacing and its use by the API download loops
+"""
+
+from openlp_sync_plugin.api_client import ApiClient
+from openlp_sync_plugin.governor import ResourceGovernor
+
+
+def test_throttle_sleeps_according_to_cpu_budget(monkeypatch):
+    governor = ResourceGovernor(cpu_budget=0.25)
+    slept = []
+    monkeypatch.setattr(governor, '_sleep', lambda seconds: slept.append(seconds) or seconds)
+
+    governor.throttle(0.1, 50)
+
+    assert slept == [0.1 * 3]
+    assert governor.stats()['throttled_seconds'] == 0.3
+
+
+def test_throttle_applies_io_budget(monkeypatch):
+    governor = ResourceGovernor(cpu_budget=1.0, io_budget=100)
+    slept = []
+    monkeypatch.setattr(governor, '_sleep', lambda seconds: slept.append(seconds) or seconds)
+
+    governor.throttle(0.1, 50)
+
+    assert slept == [0.5 - 0.1]
+
+
+def test_throttle_pauses_while_busy():
+    checks = iter([True, True, False])
+    governor = ResourceGovernor(is_busy=lambda: next(checks), poll_interval=0)
+
+    governor.throttle(0, 0)
+
+    assert governor.pause_count == 1
+
+
+def test_fetch_all_songs_reports_each_page(monkeypatch):
+    client = ApiClient('http://localhost:3000')
+    pages = {
+        1: {'data': [{'id': str(i)} for i in range(100)], 'meta': {'totalPages': 2}},
+        2: {'data': [{'id': 'last'}], 'meta': {'totalPages': 2}},
+    }
+    monkeypatch.setattr(client, '_execute', lambda req: pages[int(req.full_url.split('page=')[1].split('&')[0])])
+    calls = []
+
+    songs = client.fetch_all_songs(throttle=lambda seconds, items: calls.append(items))
+
+    assert len(songs) == 101
+    assert calls == [100, 1]
+
+
+def test_fetch_songs_by_ids_reports_each_song(monkeypatch):
+    client = ApiClient('http://localhost:3000')
+
+    def get_song_by_id(song_id):
+        if song_id == 'broken':
+            raise Exception('HTTP 500')
+        return {'id': song_id}
+
+    monkeypatch.setattr(client, 'get_song_by_id', get_song_by_id)
+    calls = []
+
+    songs, failed_ids = client.fetch_songs_by_ids(['a', 'broken', 'b'],
+                                                  throttle=lambda seconds, items: calls.append(items))
+
+    assert [song['id'] for song in songs] == ['a', 'b']
+    assert failed_ids == ['broken']
+    assert calls == [1, 1, 1]
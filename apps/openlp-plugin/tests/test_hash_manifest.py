@@ -0,0 +1,187 @@
+"""
+Tests for hash manifest reconciliation helpers.
+
+Expected digests are pinned - the same values are asserted in
+apps/api/src/songs/song.service.manifest.spec.ts, so both sides hash alike.
+"""
+
+import sqlite3
+
+from openlp_sync_plugin.hash_manifest import (
+    song_content_hash, bucket_key, bucket_hash, build_hash_manifest,
+    group_by_bucket, mismatched_buckets, find_drift
+)
+from openlp_sync_plugin.sync_service import SyncService
+
+from conftest import make_song
+
+SONG_A = {
+    'id': '507f1f77bcf86cd799439011',
+    'title': 'Amazing Grace',
+    'number': '123',
+    'copyright': None,
+    'ccliNumber': None,
+    'verses': 'Verse 1\n\nVerse 2',
+}
+SONG_B = {
+    'id': '507f1f77bcf86cd799439012',
+    'title': 'Zażółć gęślą jaźń',
+    'number': None,
+    'copyright': '(c) 2024',
+    'ccliNumber': '999',
+    'verses': 'Zwrotka',
+}
+HASH_A = '322b64c14a1218db7c0b1d7904d0aecf8671d35b'
+HASH_B = 'b858fd07a77c81766ca08badd3bc8fcc591e46d4'
+
+
+class BucketStandIn:
+    """Local stand-in for GET /songs/manifest/:bucket recording fetched buckets"""
+
+    def __init__(self, remote_entries):
+        self.buckets = group_by_bucket(remote_entries)
+        self.fetched = []
+
+    def __call__(self, key):
+        self.fetched.append(key)
+        return self.buckets.get(key, {})
+
+
+def reconcile(local_entries, remote_entries, out_of_scope=()):
+    """Run find_drift against a stand-in built from remote entries"""
+    stand_in = BucketStandIn(remote_entries)
+    drift = find_drift(local_entries, build_hash_manifest(remote_entries), stand_in,
+                       out_of_scope=out_of_scope)
+    return drift, stand_in.fetched
+
+
+def reconcile_scoped(service, scope, remote_entries):
+    """Reconcile the way SyncWorker does - scoped local songs, the rest out of scope"""
+    local_entries = service.get_local_hash_entries(scope)
+    out_of_scope = set(service.get_local_hash_entries()) - set(local_entries)
+    return reconcile(local_entries, remote_entries, out_of_scope)
+
+
+def test_song_content_hash_matches_api():
+    assert song_content_hash(SONG_A) == HASH_A
+    assert song_content_hash(SONG_B) == HASH_B
+
+
+def test_song_content_hash_joins_verse_list_like_api():
+    song = dict(SONG_A, verses=[{'order': 2, 'content': 'Verse 2'}, {'order': 1, 'content': 'Verse 1'}])
+    assert song_content_hash(song) == HASH_A
+
+
+def test_bucket_key_uses_hashed_id_prefix():
+    assert bucket_key(SONG_A['id']) == '96'
+    assert bucket_key(SONG_B['id']) == '3f'
+    assert bucket_key(SONG_A['id'], 1) == '9'
+
+
+def test_bucket_hash_is_order_independent():
+    expected = '6e7dd17a7866e10b237a798462ff052cd2c51623'
+    assert bucket_hash({SONG_A['id']: HASH_A, SONG_B['id']: HASH_B}) == expected
+    assert bucket_hash({SONG_B['id']: HASH_B, SONG_A['id']: HASH_A}) == expected
+
+
+def test_build_hash_manifest_matches_api():
+    assert build_hash_manifest({SONG_A['id']: HASH_A, SONG_B['id']: HASH_B}) == {
+        '96': '8b5e0e8f20ad0a1c1717c6bdf1637a3be8cde3a1',
+        '3f': '4d9543ae7e375a1ed080cce9ed6f2613887a0e3a',
+    }
+
+
+def test_mismatched_buckets():
+    assert mismatched_buckets({'aa': '1', 'bb': '2'}, {'aa': '1', 'bb': '3', 'cc': '4'}) == ['bb', 'cc']
+
+
+def test_no_drift_fetches_nothing():
+    entries = {SONG_A['id']: HASH_A, SONG_B['id']: HASH_B}
+    drift, fetched = reconcile(entries, entries)
+    assert drift == {'refetch': [], 'deleted': []}
+    assert fetched == []
+
+
+def test_missing_song_is_refetched():
+    drift, fetched = reconcile({SONG_A['id']: HASH_A}, {SONG_A['id']: HASH_A, SONG_B['id']: HASH_B})
+    assert drift == {'refetch': [SONG_B['id']], 'deleted': []}
+    assert fetched == ['3f']
+
+
+def test_edited_song_is_refetched():
+    edited = song_content_hash(dict(SONG_B, title='Nowy tytuł'))
+    drift, fetched = reconcile({SONG_A['id']: HASH_A, SONG_B['id']: HASH_B},
+                               {SONG_A['id']: HASH_A, SONG_B['id']: edited})
+    assert drift == {'refetch': [SONG_B['id']], 'deleted': []}
+    assert fetched == ['3f']
+
+
+def test_song_only_local_is_reported_deleted_without_fetch():
+    drift, fetched = reconcile({SONG_A['id']: HASH_A, SONG_B['id']: HASH_B}, {SONG_A['id']: HASH_A})
+    assert drift == {'refetch': [], 'deleted': [SONG_B['id']]}
+    # Bucket is gone remotely - nothing to ask the API for
+    assert fetched == []
+
+
+def test_deleted_song_stops_mismatching_once_removed(db_path):
+    songs = [make_song(f'song-{i}', f'Pieśń {i}') for i in range(40)]
+    service = SyncService(db_path)
+    service.sync_songs(songs)
+    remote = {song['id']: song_content_hash(song) for song in songs[1:]}
+
+    drift, _ = reconcile(service.get_local_hash_entries(), remote)
+    assert drift == {'refetch': [], 'deleted': ['song-0']}
+
+    service.delete_songs(drift['deleted'])
+    drift, fetched = reconcile(service.get_local_hash_entries(), remote)
+    assert drift == {'refetch': [], 'deleted': []}
+    assert fetched == []
+
+
+def test_locally_edited_row_is_refetched(db_path):
+    songs = [make_song(f'song-{i}', f'Pieśń {i}') for i in range(40)]
+    service = SyncService(db_path)
+    service.sync_songs(songs)
+    remote = {song['id']: song_content_hash(song) for song in songs}
+
+    drift, fetched = reconcile(service.get_local_hash_entries(), remote)
+    assert drift == {'refetch': [], 'deleted': []}
+
+    # Edited directly in OpenLP - API content is unchanged
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE songs SET lyrics = 'edytowane' WHERE title = 'Pieśń 7'")
+    conn.commit()
+    conn.close()
+
+    drift, fetched = reconcile(service.get_local_hash_entries(), remote)
+    assert drift == {'refetch': ['song-7'], 'deleted': []}
+    assert fetched == [bucket_key('song-7')]
+
+
+def test_song_leaving_scope_is_deleted(db_path):
+    songs = [make_song('in', 'W zakresie', tags=[{'id': '1', 'name': 'nowe'}]),
+             make_song('out', 'Poza zakresem', tags=[{'id': '2', 'name': 'stare'}])]
+    service = SyncService(db_path)
+    service.sync_songs(songs)
+    remote = {'in': song_content_hash(songs[0])}
+
+    drift, _ = reconcile_scoped(service, {'tags': ['nowe']}, remote)
+    assert drift == {'refetch': [], 'deleted': ['out']}
+
+
+def test_song_entering_scope_is_refetched_not_deleted(db_path):
+    song = make_song('moved', 'Przeniesiona', tags=[{'id': '2', 'name': 'stare'}])
+    service = SyncService(db_path)
+    service.sync_songs([song])
+    # Tagged 'nowe' in the API since the last sync - local metadata still says 'stare'
+    song = dict(song, tags=[{'id': '1', 'name': 'nowe'}])
+    remote = {'moved': song_content_hash(song)}
+
+    drift, _ = reconcile_scoped(service, {'tags': ['nowe']}, remote)
+    assert drift == {'refetch': ['moved'], 'deleted': []}
+
+    result = service.sync_songs([song])
+    assert result['updated'] == 1
+    drift, fetched = reconcile_scoped(service, {'tags': ['nowe']}, remote)
+    assert drift == {'refetch': [], 'deleted': []}
+    assert fetched == []
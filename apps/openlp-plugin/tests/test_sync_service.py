@@ -0,0 +1,288 @@
+"""
+Tests for SyncService writes, full refresh and table swap
+"""
+
+import sqlite3
+
+import pytest
+
+from openlp_sync_plugin.sync_service import SyncService
+
+from conftest import make_song
+
+
+def fetch_all(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def song_ids_by_title(db_path):
+    return dict(fetch_all(db_path, "SELECT title, id FROM songs"))
+
+
+def add_local_song(db_path, title):
+    """Song created by hand in OpenLP - no backend ID"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO songs (title, lyrics, search_title, search_lyrics, comments) "
+                 "VALUES (?, '', ?, '', 'moja notatka')", (title, title.lower()))
+    conn.commit()
+    conn.close()
+
+
+def link_author(db_path, song_id):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT OR IGNORE INTO authors (id, display_name) VALUES (1, 'Autor')")
+    conn.execute("INSERT INTO authors_songs (author_id, song_id) VALUES (1, ?)", (song_id,))
+    conn.commit()
+    conn.close()
+
+
+def test_sync_songs_creates_and_updates_in_batches(db_path):
+    service = SyncService(db_path, batch_size=2)
+    songs = [make_song(f's{i}', f'Pieśń {i}') for i in range(5)]
+
+    result = service.sync_songs(songs)
+    assert (result['created'], result['updated'], result['errors']) == (5, 0, 0)
+    assert sorted(result['changed_ids']) == sorted(song_ids_by_title(db_path).values())
+
+    result = service.sync_songs([make_song('s1', 'Zmieniona'), {'title': 'Bez ID'}])
+    assert (result['created'], result['updated'], result['errors']) == (0, 1, 1)
+    assert 'Zmieniona' in song_ids_by_title(db_path)
+
+
+def test_full_refresh_preserves_ids_and_local_songs(db_path):
+    service = SyncService(db_path)
+    add_local_song(db_path, 'Lokalna')
+    service.sync_songs([make_song('a', 'A'), make_song('b', 'B')])
+    before = song_ids_by_title(db_path)
+
+    result = service.full_refresh([make_song('a', 'A2'), make_song('b', 'B'), make_song('c', 'C')])
+
+    after = song_ids_by_title(db_path)
+    assert (result['created'], result['updated'], result['unchanged'], result['deleted']) == (1, 1, 1, 0)
+    assert after['Lokalna'] == before['Lokalna']
+    assert after['A2'] == before['A']
+    assert after['B'] == before['B']
+    assert 'C' in after
+
+
+def test_full_refresh_swaps_table_and_recreates_indexes(db_path):
+    service = SyncService(db_path)
+    service.sync_songs([make_song('a', 'A')])
+    schema_before = fetch_all(db_path, "SELECT type, name FROM sqlite_master ORDER BY name")
+
+    service.full_refresh([make_song('a', 'A')])
+    service.full_refresh([make_song('a', 'A'), make_song('b', 'B')])
+
+    assert fetch_all(db_path, "SELECT type, name FROM sqlite_master ORDER BY name") == schema_before
+    assert fetch_all(db_path, "SELECT sql FROM sqlite_master WHERE name = 'ix_songs_search_title'") == [
+        ('CREATE INDEX ix_songs_search_title ON songs (search_title)',)
+    ]
+    assert sorted(song_ids_by_title(db_path)) == ['A', 'B']
+
+
+def test_full_refresh_prunes_missing_songs_and_linked_rows(db_path):
+    service = SyncService(db_path)
+    service.sync_songs([make_song('a', 'A'), make_song('b', 'B'), make_song('p', 'P')])
+    ids = song_ids_by_title(db_path)
+    link_author(db_path, ids['A'])
+    link_author(db_path, ids['B'])
+
+    result = service.full_refresh([make_song('a', 'A')], keep_ids={'p'})
+
+    assert result['deleted'] == 1
+    assert ids['B'] in result['changed_ids']
+    assert sorted(song_ids_by_title(db_path)) == ['A', 'P']
+    assert fetch_all(db_path, "SELECT song_id FROM authors_songs") == [(ids['A'],)]
+
+
+class OpenLPWrites:
+    """Governor stand-in running OpenLP's own writes between staging batches"""
+
+    def __init__(self, db_path, after_batch, write):
+        self.db_path = db_path
+        self.after_batch = after_batch
+        self.write = write
+        self.batches = 0
+
+    def throttle(self, work_seconds, items):
+        self.batches += 1
+        if self.batches == self.after_batch:
+            conn = sqlite3.connect(self.db_path)
+            self.write(conn)
+            conn.commit()
+            conn.close()
+
+
+def test_full_refresh_keeps_song_created_in_openlp_during_load(db_path):
+    SyncService(db_path).sync_songs([make_song('a', 'A')])
+
+    def create_song(conn):
+        song_id = conn.execute("INSERT INTO songs (title, lyrics, search_title, search_lyrics) "
+                               "VALUES ('Nowa lokalna', '', 'nowa lokalna', '')").lastrowid
+        conn.execute("INSERT INTO authors (id, display_name) VALUES (1, 'Autor')")
+        conn.execute("INSERT INTO authors_songs (author_id, song_id) VALUES (1, ?)", (song_id,))
+
+    # B is staged under ID 2 before OpenLP creates its own song 2
+    service = SyncService(db_path, batch_size=1, governor=OpenLPWrites(db_path, 2, create_song))
+    result = service.full_refresh([make_song('a', 'A'), make_song('b', 'B'), make_song('c', 'C')])
+
+    ids = song_ids_by_title(db_path)
+    assert ids == {'A': 1, 'Nowa lokalna': 2, 'C': 3, 'B': 4}
+    assert sorted(result['changed_ids']) == [3, 4]
+    assert fetch_all(db_path, "SELECT song_id FROM authors_songs") == [(2,)]
+
+
+def test_full_refresh_keeps_edits_and_deletions_made_in_openlp_during_load(db_path):
+    SyncService(db_path).sync_songs([make_song('a', 'A'), make_song('d', 'D')])
+
+    def edit_and_delete(conn):
+        conn.execute("UPDATE songs SET lyrics = 'edytowane', last_modified = '2999-01-01 00:00:00' "
+                     "WHERE title = 'A'")
+        conn.execute("DELETE FROM songs WHERE title = 'D'")
+
+    service = SyncService(db_path, batch_size=1, governor=OpenLPWrites(db_path, 1, edit_and_delete))
+    service.full_refresh([make_song('a', 'A2'), make_song('d', 'D2')])
+
+    assert fetch_all(db_path, "SELECT title, lyrics FROM songs") == [('A', 'edytowane')]
+
+
+def test_full_refresh_error_leaves_live_table_untouched(db_path, monkeypatch):
+    service = SyncService(db_path)
+    service.sync_songs([make_song('a', 'A')])
+
+    def fail_swap(*args):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(service, '_swap_staging_table', fail_swap)
+    with pytest.raises(Exception):
+        service.full_refresh([make_song('a', 'A2'), make_song('b', 'B')])
+
+    assert sorted(song_ids_by_title(db_path)) == ['A']
+    assert not fetch_all(db_path, "SELECT name FROM sqlite_master WHERE name = 'songs_staging'")
+
+
+def test_sync_songs_drops_stale_staging_table(db_path):
+    # Left behind by a full refresh that crashed before the swap
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE songs_staging AS SELECT * FROM songs")
+    conn.commit()
+    conn.close()
+
+    SyncService(db_path).sync_songs([make_song('a', 'A')])
+
+    assert not fetch_all(db_path, "SELECT name FROM sqlite_master WHERE name = 'songs_staging'")
+
+
+def test_delete_songs_removes_linked_rows(db_path):
+    service = SyncService(db_path, batch_size=1)
+    service.sync_songs([make_song('a', 'A'), make_song('b', 'B'), make_song('c', 'C')])
+    ids = song_ids_by_title(db_path)
+    link_author(db_path, ids['B'])
+
+    removed = service.delete_songs(['b', 'c', 'unknown'])
+
+    assert sorted(removed) == sorted([ids['B'], ids['C']])
+    assert sorted(song_ids_by_title(db_path)) == ['A']
+    assert fetch_all(db_path, "SELECT * FROM authors_songs") == []
+
+
+def test_sync_songs_with_keep_ids_prunes_missing_songs(db_path):
+    service = SyncService(db_path)
+    add_local_song(db_path, 'Lokalna')
+    service.sync_songs([make_song('a', 'A'), make_song('b', 'B'), make_song('p', 'P')])
+    ids = song_ids_by_title(db_path)
+    link_author(db_path, ids['B'])
+
+    result = service.sync_songs([make_song('a', 'A')], keep_ids={'p'})
+
+    assert result['deleted'] == 1
+    assert ids['B'] in result['changed_ids']
+    assert sorted(song_ids_by_title(db_path)) == ['A', 'Lokalna', 'P']
+    assert fetch_all(db_path, "SELECT * FROM authors_songs") == []
+
+
+def test_empty_catalog_never_prunes(db_path):
+    service = SyncService(db_path)
+    service.sync_songs([make_song('a', 'A'), make_song('b', 'B')])
+
+    assert service.sync_songs([], keep_ids=set())['deleted'] == 0
+    assert service.full_refresh([], keep_ids=set())['deleted'] == 0
+    assert sorted(song_ids_by_title(db_path)) == ['A', 'B']
+
+
+def test_full_refresh_without_keep_ids_does_not_prune(db_path):
+    service = SyncService(db_path)
+    service.sync_songs([make_song('a', 'A'), make_song('b', 'B')])
+
+    assert service.full_refresh([make_song('a', 'A')])['deleted'] == 0
+    assert sorted(song_ids_by_title(db_path)) == ['A', 'B']
+
+
+def test_sync_songs_without_keep_ids_does_not_prune(db_path):
+    service = SyncService(db_path)
+    service.sync_songs([make_song('a', 'A'), make_song('b', 'B')])
+
+    result = service.sync_songs([make_song('a', 'A')])
+
+    assert 'deleted' not in result
+    assert sorted(song_ids_by_title(db_path)) == ['A', 'B']
+
+
+def test_local_hash_entries_filtered_by_scope(db_path):
+    service = SyncService(db_path)
+    service.sync_songs([
+        make_song('pl', 'Polska', language='pl', songbook='pielgrzym', tags=[{'id': '1', 'name': 'uwielbienie'}]),
+        make_song('en', 'English', language='en', songbook=None, tags=[{'id': '2', 'name': 'kolędy'}]),
+    ])
+
+    assert set(service.get_local_hash_entries()) == {'pl', 'en'}
+    assert set(service.get_local_hash_entries({'language': 'pl'})) == {'pl'}
+    assert set(service.get_local_hash_entries({'songbook': 'pielgrzym'})) == {'pl'}
+    assert set(service.get_local_hash_entries({'songbook': 'zborowe'})) == {'en'}
+    assert set(service.get_local_hash_entries({'tags': ['kolędy', 'inne']})) == {'en'}
+    assert service.get_local_hash_entries({'language': 'pl', 'tags': ['kolędy']}) == {}
+
+
+def test_local_hash_entries_without_scope_fields_stay_in_scope(db_path):
+    # Synced before scope fields were stored in comments
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO songs (title, lyrics, search_title, search_lyrics, comments) "
+                 "VALUES ('Stara', '', 'stara', '', ?)", ('{"backendId": "old", "contentHash": "x"}',))
+    conn.commit()
+    conn.close()
+
+    assert set(SyncService(db_path).get_local_hash_entries({'language': 'pl'})) == {'old'}
+
+
+def test_sync_songs_reports_written_backend_ids(db_path):
+    result = SyncService(db_path).sync_songs([make_song('a', 'A'), make_song('broken', None)])
+
+    assert result['synced_ids'] == ['a']
+    assert result['errors'] == 1
+
+
+def test_sync_songs_skips_unchanged_songs(db_path):
+    service = SyncService(db_path)
+    songs = [make_song('a', 'A'), make_song('b', 'B', tags=[{'id': '1', 'name': 'kolędy'}])]
+    service.sync_songs(songs)
+    ids = song_ids_by_title(db_path)
+
+    result = service.sync_songs(songs)
+    assert (result['created'], result['updated'], result['unchanged']) == (0, 0, 2)
+    assert result['changed_ids'] == []
+    assert result['synced_ids'] == ['a', 'b']
+
+    # Edited in OpenLP, and moved to another tag in the API - both are written again
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE songs SET lyrics = 'edytowane' WHERE id = ?", (ids['A'],))
+    conn.commit()
+    conn.close()
+    songs[1]['tags'] = [{'id': '2', 'name': 'uwielbienie'}]
+
+    result = service.sync_songs(songs)
+    assert (result['updated'], result['unchanged']) == (2, 0)
+    assert sorted(result['changed_ids']) == sorted(ids.values())